@@ -1,107 +1,286 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, Response, render_template, request, redirect, url_for, session, stream_with_context
 from werkzeug.utils import secure_filename
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
+import json
+import mimetypes
 import os
+import threading
+import uuid
 
-from db import init_db, get_db_connection
-from psycopg2.extras import RealDictCursor
+from db import init_db, db_cursor, pool_stats
 
 # Backend helpers
-from auth.auth_backend import login_user, signup_user, load_users
-from chatbot_backend import ask_ai
-from utils.ai_tags import generate_ai_tags
-from utils.storage_utils import upload_file_with_metadata, delete_file, rename_file
-from utils.pdf_utils import summarize_pdf
-from utils.ai_logs import load_ai_logs, save_ai_log
+from auth.auth_backend import login_user, signup_user, load_users_page, count_users, set_user_role, revoke_user, ROLES
+from auth.passwords import PasswordPoolBusy, get_password_pool
+from chatbot_backend import ask_ai, ask_ai_stream, MODEL_NAME
+from utils.ai_tags import tag_weights
+from utils.storage_utils import (
+    upload_stream, delete_file, rename_file,
+    presigned_post, multipart_part_size, start_multipart, presign_part,
+    list_uploaded_parts, complete_multipart, abort_multipart, object_size, MAX_PARTS
+)
+from utils.s3_helper import cloudfront_url, TRANSFER_CONFIG
+from utils.upload_stream import MultipartFileStream, HashingReader
+from utils.job_queue import get_job_queue, ensure_workers
+from utils import upload_pipeline as pipeline
+from utils.ai_logs import load_ai_logs_page, count_ai_logs, queue_ai_log, get_ai_log_buffer
+from utils.ai_cache import get_response_cache
+from utils.question_index import get_question_index, CHAT_SIMILARITY_THRESHOLD
+from utils.file_types import file_kind
+from utils.tag_store import TAGS_ARRAY_SQL, set_upload_tags, copy_upload_tags, parse_tag_query, tag_filter_sql
+from utils.pagination import decode_cursor, decode_rank_cursor, page_limit, split_page
+from utils.content_search import search_contents
+from utils.pdf_extract import cached_text
+from utils.user_cache import get_user_cache
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-key")
 
-# ---------- TEMP UPLOAD FOLDER (only for local temp files) ----------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Direct browser -> S3 uploads
+DIRECT_UPLOAD_MAX_BYTES = int(os.getenv("DIRECT_UPLOAD_MAX_MB", "2048")) * 1024 * 1024
+DIRECT_UPLOAD_TOKEN_AGE = 24 * 3600  # seconds an unfinished upload can be resumed
+DIRECT_UPLOAD_PARTS_PER_CALL = 100   # part URLs presigned per request
+upload_tokens = URLSafeTimedSerializer(app.secret_key, salt="direct-upload")
+
+# List page sizes (?limit= is clamped to PAGE_MAX)
+FILES_PAGE_SIZE = 30
+ADMIN_PAGE_SIZE = 25
+PAGE_MAX = 100
 
 
 # ======================================================
 # DB HELPERS FOR UPLOADS
 # ======================================================
-def db_get_uploads():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("""
-        SELECT id, uploaded_by, filename, url, tags, summary, uploaded_at
-        FROM uploads
-        ORDER BY uploaded_at DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    # Convert tags string "a,b,c" -> ["a","b","c"]
-    for r in rows:
-        t = r.get("tags") or ""
-        r["tags"] = [x.strip() for x in t.split(",") if x.strip()]
-    return rows
+# Column lists per page -- list views never pull more text than they show
+FILE_LIST_COLUMNS = f"id, uploaded_by, filename, url, uploaded_at, {TAGS_ARRAY_SQL}"
+TEACHER_FILE_COLUMNS = f"id, filename, url, summary, status, uploaded_at, {TAGS_ARRAY_SQL}"
+ADMIN_FILE_COLUMNS = "id, filename, uploaded_by, uploaded_at"
+
+
+def db_list_uploads(columns: str = FILE_LIST_COLUMNS, search: str = "", kind: str = "all",
+                    uploaded_by: str | None = None, tags=(), tag_prefixes=(), tag_mode: str = "all",
+                    cursor=None, limit: int = 30):
+    """
+    One page of uploads matching `search` (filename / tags / summary),
+    `kind`, tags (exact / prefix, AND or OR) and optionally `uploaded_by`,
+    newest first. Returns (rows, next_cursor).
+    """
+    where, params = [], []
+
+    if search:
+        escaped = search.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("search_text LIKE %s")
+        params.append(f"%{escaped}%")
 
+    if kind and kind != "all":
+        where.append("kind = %s")
+        params.append(kind)
 
-def db_add_upload(upload_dict: dict):
-    conn = get_db_connection()
-    cur = conn.cursor()
+    if uploaded_by:
+        where.append("uploaded_by = %s")
+        params.append(uploaded_by)
+
+    tag_sql, tag_params = tag_filter_sql(tags, tag_prefixes, tag_mode)
+    if tag_sql:
+        where.append(tag_sql)
+        params.extend(tag_params)
+
+    if cursor:
+        where.append("(uploaded_at, id) < (%s, %s)")
+        params.extend(cursor)
+
+    sql = f"SELECT {columns} FROM uploads"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY uploaded_at DESC, id DESC LIMIT %s;"
+    params.append(limit + 1)
+
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+
+    return split_page(rows, limit, "uploaded_at")
+
+
+def db_count_uploads() -> int:
+    with db_cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM uploads;")
+        return cur.fetchone()[0]
+
+
+def db_owner_stats(username: str) -> dict:
+    """File count and storage total for one uploader, per kind and overall."""
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute("""
+            SELECT kind, COUNT(*) AS files, COALESCE(SUM(size_bytes), 0)::bigint AS bytes
+            FROM uploads
+            WHERE uploaded_by = %s
+            GROUP BY kind
+            ORDER BY kind;
+        """, (username,))
+        by_kind = cur.fetchall()
+
+    return {
+        "files": sum(r["files"] for r in by_kind),
+        "bytes": sum(r["bytes"] for r in by_kind),
+        "by_kind": by_kind,
+    }
 
+
+def db_add_upload(upload_dict: dict):
     tags_list = upload_dict.get("tags") or []
     tags_str = ",".join(tags_list)
 
-    cur.execute("""
-        INSERT INTO uploads (uploaded_by, filename, url, tags, summary)
-        VALUES (%s, %s, %s, %s, %s);
-    """, (
-        upload_dict["uploaded_by"],
-        upload_dict["filename"],
-        upload_dict["url"],
-        tags_str,
-        upload_dict.get("summary")
-    ))
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO uploads
+                (uploaded_by, filename, url, tags, summary, kind, size_bytes, content_hash, status, s3_key)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id;
+        """, (
+            upload_dict["uploaded_by"],
+            upload_dict["filename"],
+            upload_dict["url"],
+            tags_str,
+            upload_dict.get("summary"),
+            file_kind(upload_dict["filename"]),
+            upload_dict.get("size_bytes"),
+            upload_dict.get("content_hash"),
+            upload_dict.get("status", "ready"),
+            upload_dict.get("s3_key")
+        ))
+        upload_id = cur.fetchone()[0]
+        set_upload_tags(cur, upload_id, tags_list)
+    return upload_id
+
+
+def db_get_upload_status(upload_id: int, username: str):
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute(f"""
+            SELECT id, url, status, summary, {TAGS_ARRAY_SQL}
+            FROM uploads
+            WHERE id = %s AND uploaded_by = %s;
+        """, (upload_id, username))
+        return cur.fetchone()
+
+
+def db_find_upload_by_key(s3_key: str, username: str):
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute("""
+            SELECT id, url FROM uploads
+            WHERE uploaded_by = %s AND s3_key = %s
+            LIMIT 1;
+        """, (username, s3_key))
+        return cur.fetchone()
+
+
+def db_find_upload(filename: str, username: str):
+    """The owner's upload row by filename (with its S3 key and content hash), or None."""
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute("""
+            SELECT id, filename, s3_key, content_hash
+            FROM uploads
+            WHERE uploaded_by = %s AND filename = %s
+            LIMIT 1;
+        """, (username, filename))
+        return cur.fetchone()
 
 
 def db_delete_upload(filename: str, username: str):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        DELETE FROM uploads
-        WHERE filename = %s AND uploaded_by = %s;
-    """, (filename, username))
-    conn.commit()
-    cur.close()
-    conn.close()
+    """
+    Delete the owner's rows; returns the S3 keys they pointed at that no
+    other upload still uses (deduplicated uploads share one object).
+    """
+    with db_cursor() as cur:
+        cur.execute("""
+            WITH gone AS (
+                DELETE FROM uploads
+                WHERE uploaded_by = %s AND filename = %s
+                RETURNING id, COALESCE(s3_key, filename) AS key
+            )
+            SELECT DISTINCT key FROM gone
+            WHERE NOT EXISTS (
+                SELECT 1 FROM uploads u
+                WHERE u.s3_key = gone.key AND u.id NOT IN (SELECT id FROM gone)
+            );
+        """, (username, filename))
+        return [r[0] for r in cur.fetchall()]
 
 
 def db_rename_upload(old_name: str, new_name: str, username: str, new_tags):
-    conn = get_db_connection()
-    cur = conn.cursor()
     tags_str = ",".join(new_tags) if new_tags else ""
-    cur.execute("""
-        UPDATE uploads
-        SET filename = %s, tags = %s
-        WHERE filename = %s AND uploaded_by = %s;
-    """, (new_name, tags_str, old_name, username))
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_cursor() as cur:
+        cur.execute("""
+            UPDATE uploads
+            SET filename = %s, tags = %s, kind = %s
+            WHERE uploaded_by = %s AND filename = %s
+            RETURNING id;
+        """, (new_name, tags_str, file_kind(new_name), username, old_name))
+        for (upload_id,) in cur.fetchall():
+            set_upload_tags(cur, upload_id, new_tags)
+
+
+def new_object_key(filename: str) -> str:
+    """Unique S3 key per upload, so objects can be shared between rows."""
+    return f"materials/{uuid.uuid4().hex}/{filename}"
+
+
+def add_duplicate_upload(dup: dict, filename: str, content_hash: str):
+    """Record an upload whose content is already stored and processed."""
+    upload_id = db_add_upload({
+        "uploaded_by": session["username"],
+        "filename": filename,
+        "url": dup["url"],
+        "tags": dup["tags"],
+        "summary": dup["summary"],
+        "size_bytes": dup["size_bytes"],
+        "content_hash": content_hash,
+        "status": "ready",
+        "s3_key": dup["s3_key"]
+    })
+    with db_cursor() as cur:
+        copy_upload_tags(cur, dup["id"], upload_id)   # keep the weights
+    return upload_id
 
 
 # ======================================================
 # INIT DB ON FIRST REQUEST
 # ======================================================
-@app.before_first_request
+# (Flask 3 dropped before_first_request: run once per process from before_request)
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+
+@app.before_request
 def before_first_request():
-    init_db()
+    global _db_ready
+    if not _db_ready:
+        with _db_ready_lock:
+            if not _db_ready:
+                init_db()
+                _db_ready = True
+
+
+# Background workers for upload processing (one set per gunicorn worker process)
+@app.before_request
+def start_job_workers():
+    ensure_workers(pipeline.HANDLERS, pipeline.ON_FAILURE)
+
+
+# ======================================================
+# TEMPLATE FILTERS
+# ======================================================
+@app.template_filter("filesize")
+def filesize(num) -> str:
+    num = float(num or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if num < 1024 or unit == "GB":
+            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.1f} {unit}"
+        num /= 1024
 
 
 # ======================================================
@@ -112,7 +291,19 @@ def login_required(role=None):
         def decorated(*args, **kwargs):
             if "username" not in session:
                 return redirect(url_for("login"))
-            if role and session.get("role") != role:
+
+            # Role + version from the per-process user cache (re-read every USER_CACHE_TTL s)
+            user = get_user_cache().get(
+                session["username"],
+                fallback={"role": session.get("role"), "version": session.get("user_version")}
+            )
+            version = session.get("user_version")
+            if user is None or (version is not None and user["version"] != version):
+                # Account revoked or role changed since this session signed in
+                session.clear()
+                return redirect(url_for("login"))
+
+            if role and user["role"] != role:
                 return redirect(url_for("dashboard"))
             return fn(*args, **kwargs)
         decorated.__name__ = fn.__name__
@@ -130,18 +321,25 @@ def home():
 
 
 # ---------- LOGIN ----------
+BUSY_MESSAGE = "⏳ Lots of people are signing in right now. Please try again in a moment."
+
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         username = request.form.get("username", "")
         password = request.form.get("password", "")
 
-        success, msg, user = login_user(username, password)
+        try:
+            success, msg, user = login_user(username, password)
+        except PasswordPoolBusy:
+            return render_template("login.html", error=BUSY_MESSAGE), 503, {"Retry-After": "2"}
         if not success:
             return render_template("login.html", error=msg)
 
         session["username"] = user["username"]
         session["role"] = user["role"]
+        session["user_version"] = user["version"]
         return redirect(url_for("dashboard"))
 
     return render_template("login.html")
@@ -155,7 +353,10 @@ def signup():
         p = request.form.get("password", "")
         r = request.form.get("role", "")
 
-        ok, msg = signup_user(u, p, r)
+        try:
+            ok, msg = signup_user(u, p, r)
+        except PasswordPoolBusy:
+            return render_template("signup.html", error=BUSY_MESSAGE), 503, {"Retry-After": "2"}
         if not ok:
             return render_template("signup.html", error=msg)
 
@@ -186,10 +387,15 @@ def dashboard():
 @app.route("/dashboard/student")
 @login_required("Student")
 def student_dashboard():
+    files, next_cursor = db_list_uploads(
+        cursor=decode_cursor(request.args.get("cursor")),
+        limit=page_limit(request.args.get("limit"), FILES_PAGE_SIZE, PAGE_MAX)
+    )
     return render_template(
         "student_dashboard.html",
         username=session["username"],
-        files=db_get_uploads()
+        files=files,
+        next_cursor=next_cursor
     )
 
 
@@ -207,22 +413,56 @@ def teacher_dashboard():
 @app.route("/dashboard/admin")
 @login_required("Admin")
 def admin_dashboard():
-    users = load_users()
-    files = db_get_uploads()
-    ai_logs = load_ai_logs()
+    limit = page_limit(request.args.get("limit"), ADMIN_PAGE_SIZE, PAGE_MAX)
+    cursors = {
+        "users_cursor": request.args.get("users_cursor"),
+        "files_cursor": request.args.get("files_cursor"),
+        "logs_cursor": request.args.get("logs_cursor"),
+    }
+
+    users, next_users = load_users_page(decode_cursor(cursors["users_cursor"]), limit)
+    files, next_files = db_list_uploads(
+        columns=ADMIN_FILE_COLUMNS,
+        cursor=decode_cursor(cursors["files_cursor"]),
+        limit=limit
+    )
+    ai_logs, next_logs = load_ai_logs_page(decode_cursor(cursors["logs_cursor"]), limit)
 
     return render_template(
         "admin_dashboard.html",
         username=session["username"],
-        total_users=len(users),
-        total_files=len(files),
-        ai_queries=len(ai_logs),
+        total_users=count_users(),
+        total_files=db_count_uploads(),
+        ai_queries=count_ai_logs(),
+        ai_cache=get_response_cache(MODEL_NAME).stats(),
         users=users,
+        roles=ROLES,
         files=files,
-        ai_logs=ai_logs
+        ai_logs=ai_logs,
+        cursors=cursors,
+        next_users=next_users,
+        next_files=next_files,
+        next_logs=next_logs
     )
 
 
+@app.post("/admin/users/<username>/role")
+@login_required("Admin")
+def admin_set_role(username):
+    role = request.form.get("role", "")
+    if role in ROLES and username != session["username"]:
+        set_user_role(username, role)
+    return redirect(url_for("admin_dashboard"))
+
+
+@app.post("/admin/users/<username>/revoke")
+@login_required("Admin")
+def admin_revoke_user(username):
+    if username != session["username"]:
+        revoke_user(username)
+    return redirect(url_for("admin_dashboard"))
+
+
 # ======================================================
 # CHATBOT
 # ======================================================
@@ -232,16 +472,92 @@ def chatbot():
     return render_template("chatbot.html")
 
 
+def similar_answer(q: str):
+    """Stored answer to a close paraphrase of `q`; None on a miss or a DB error."""
+    if not q:
+        return None
+    try:
+        return get_question_index().lookup(q, CHAT_SIMILARITY_THRESHOLD)
+    except Exception:
+        # Only the reuse is lost: the question still goes to the model
+        app.logger.exception("Question index lookup failed")
+        return None
+
+
 @app.post("/api/chat")
 @login_required()
 def api_chat():
     data = request.get_json() or {}
     q = (data.get("message") or "").strip()
-    ans = ask_ai(q)
-    save_ai_log(q, ans, session["username"])
+
+    # A close paraphrase of an earlier question reuses its answer
+    ans = similar_answer(q)
+    if ans is None:
+        ans = ask_ai(q)
+    queue_ai_log(q, ans, session["username"])   # written in the background, batched
     return {"answer": ans}
 
 
+@app.post("/api/chat/stream")
+@login_required()
+def api_chat_stream():
+    """
+    Same as /api/chat, streamed as Server-Sent Events:
+    `data: {"text": ...}` per chunk, then `event: done`.
+    The Q/A is logged once, when the stream ends. Only a complete answer is
+    logged (and so indexed for reuse): a stream the client dropped isn't
+    logged, and one that failed half-way is logged as its "AI Error: ..."
+    message alone, which the question index skips.
+    """
+    data = request.get_json() or {}
+    q = (data.get("message") or "").strip()
+    username = session["username"]
+
+    def events():
+        parts = []
+        error = None
+        complete = False
+        try:
+            ans = similar_answer(q)
+            chunks = [ans] if ans is not None else ask_ai_stream(q)
+            for text in chunks:
+                if text.startswith("AI Error:"):
+                    error = text
+                else:
+                    parts.append(text)
+                yield f"data: {json.dumps({'text': text})}\n\n"
+            complete = True
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            # Runs on normal end and on client disconnect (GeneratorExit)
+            if error is not None:
+                queue_ai_log(q, error, username)
+            elif complete and parts:
+                queue_ai_log(q, "".join(parts).strip(), username)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ======================================================
+# METRICS (ADMIN)
+# ======================================================
+@app.get("/api/metrics")
+@login_required("Admin")
+def api_metrics():
+    return {
+        "db_pool": pool_stats(),
+        "jobs_pending": get_job_queue().pending(),
+        "ai_cache": get_response_cache(MODEL_NAME).stats(),
+        "ai_log_buffer": get_ai_log_buffer().stats(),
+        "user_cache": get_user_cache().stats(),
+        "password_pool": get_password_pool().stats()
+    }
+
+
 # ======================================================
 # UPLOAD (TEACHER)
 # ======================================================
@@ -249,81 +565,299 @@ def api_chat():
 @login_required("Teacher")
 def upload_page():
     if request.method == "POST":
-        file = request.files.get("file")
-        if not file:
+        # Read the multipart body ourselves (never touch request.files) and
+        # stream the file part straight into S3, hashing it on the way
+        boundary = request.mimetype_params.get("boundary")
+        if request.mimetype != "multipart/form-data" or not boundary:
+            return render_template("upload.html", error="Select a file!")
+
+        part = MultipartFileStream(request.stream, boundary.encode("latin-1"))
+        try:
+            part.open()
+        except ValueError:
+            return render_template("upload.html", error="Select a file!")
+        if not part.filename:
             return render_template("upload.html", error="Select a file!")
 
-        filename = secure_filename(file.filename)
+        filename = secure_filename(part.filename)
         if not filename:
             return render_template("upload.html", error="Invalid filename.")
 
-        # Save temp
-        temp_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(temp_path)
-
-        # Upload to S3 -> CloudFront
-        s3_url = upload_file_with_metadata(temp_path, key=filename)
-
-        # AI tags + optional summary
-        tags = generate_ai_tags(filename)
-        summary = summarize_pdf(temp_path) if filename.lower().endswith(".pdf") else None
-
-        # Save in DB
-        db_add_upload({
+        key = new_object_key(filename)
+        reader = HashingReader(part)
+        # Upload to S3 -> CloudFront (multipart, hashed on the fly)
+        s3_url = upload_stream(reader, key=key, content_type=part.content_type)
+
+        # Same bytes already stored and processed: keep one object, reuse its tags/summary.
+        # The hash is only known once the bytes have passed, so the copy is deleted.
+        content_hash = reader.hexdigest()
+        dup = pipeline.find_duplicate(content_hash)
+        if dup:
+            delete_file(key)
+            upload_id = add_duplicate_upload(dup, filename, content_hash)
+            return render_template("upload_success.html", url=dup["url"], upload_id=upload_id)
+
+        # Save in DB as pending; tags + summary are filled in by a background job
+        upload_id = db_add_upload({
             "uploaded_by": session["username"],
             "filename": filename,
             "url": s3_url,
-            "tags": tags,
-            "summary": summary
+            "tags": [],
+            "summary": None,
+            "size_bytes": reader.size,
+            "content_hash": content_hash,
+            "status": "pending",
+            "s3_key": key
         })
 
-        os.remove(temp_path)
-        return render_template("upload_success.html", url=s3_url, tags=tags)
+        # The worker downloads PDFs from S3 itself, so it may run on any host
+        get_job_queue().enqueue(pipeline.PROCESS_UPLOAD, {"upload_id": upload_id})
+
+        return render_template("upload_success.html", url=s3_url, upload_id=upload_id)
 
     return render_template("upload.html")
 
 
+@app.get("/api/uploads/<int:upload_id>/status")
+@login_required("Teacher")
+def upload_status(upload_id):
+    row = db_get_upload_status(upload_id, session["username"])
+    if row is None:
+        return {"error": "not found"}, 404
+    return dict(row)
+
+
+@app.get("/upload/done/<int:upload_id>")
+@login_required("Teacher")
+def upload_done(upload_id):
+    row = db_get_upload_status(upload_id, session["username"])
+    if row is None:
+        return redirect(url_for("upload_page"))
+    return render_template("upload_success.html", url=row["url"], upload_id=upload_id)
+
+
+# ======================================================
+# DIRECT UPLOADS (BROWSER -> S3, presigned)
+# ======================================================
+def _direct_claims(data: dict):
+    """Verify the signed upload token from start(); None if bad, expired or not ours."""
+    try:
+        claims = upload_tokens.loads(data.get("token") or "", max_age=DIRECT_UPLOAD_TOKEN_AGE)
+    except BadSignature:
+        return None
+    if claims.get("user") != session["username"]:
+        return None
+    return claims
+
+
+def _part_number(n, part_count: int):
+    """n if it is a part number of this upload (1..part_count), else None."""
+    if isinstance(n, bool) or not isinstance(n, int) or not 1 <= n <= part_count:
+        return None
+    return n
+
+
+@app.post("/api/uploads/direct/start")
+@login_required("Teacher")
+def direct_upload_start():
+    data = request.get_json() or {}
+    filename = secure_filename(data.get("filename") or "")
+    if not filename:
+        return {"error": "Invalid filename."}, 400
+    try:
+        size = int(data.get("size") or 0)
+    except (TypeError, ValueError):
+        size = 0
+    if size <= 0 or size > DIRECT_UPLOAD_MAX_BYTES:
+        return {"error": "File is empty or too large."}, 400
+
+    # The browser sends the file's SHA-256 when it could compute it. It is only
+    # the client's word, so it may only match this teacher's own uploads (a
+    # hash can't be used to claim someone else's file): known content is then
+    # recorded straight away, with nothing uploaded. Anything else is uploaded
+    # and deduplicated by the background job, which hashes the stored object.
+    dup = pipeline.find_duplicate(data.get("sha256"), uploaded_by=session["username"])
+    if dup and dup["size_bytes"] == size:
+        upload_id = add_duplicate_upload(dup, filename, data["sha256"])
+        return {
+            "mode": "existing",
+            "upload_id": upload_id,
+            "redirect": url_for("upload_done", upload_id=upload_id)
+        }
+
+    content_type = (data.get("content_type") or mimetypes.guess_type(filename)[0]
+                    or "application/octet-stream")
+    key = new_object_key(filename)
+    claims = {"user": session["username"], "key": key, "filename": filename, "size": size}
+
+    # Small files: one presigned POST. Large ones: presigned multipart parts.
+    if size < TRANSFER_CONFIG.multipart_threshold:
+        post = presigned_post(key, content_type, size)
+        return {
+            "mode": "post",
+            "token": upload_tokens.dumps(claims),
+            "url": post["url"],
+            "fields": post["fields"]
+        }
+
+    claims["upload_id"] = start_multipart(key, content_type)
+    part_size = multipart_part_size(size)
+    claims["part_count"] = -(-size // part_size)
+    return {
+        "mode": "multipart",
+        "token": upload_tokens.dumps(claims),
+        "part_size": part_size,
+        "part_count": claims["part_count"]
+    }
+
+
+@app.post("/api/uploads/direct/parts")
+@login_required("Teacher")
+def direct_upload_parts():
+    data = request.get_json() or {}
+    claims = _direct_claims(data)
+    if not claims or "upload_id" not in claims:
+        return {"error": "Invalid upload token."}, 400
+
+    part_count = claims.get("part_count", MAX_PARTS)
+    numbers = data.get("part_numbers")
+    if not isinstance(numbers, list) or not 0 < len(numbers) <= DIRECT_UPLOAD_PARTS_PER_CALL:
+        return {"error": f"Send 1-{DIRECT_UPLOAD_PARTS_PER_CALL} part numbers."}, 400
+    if any(_part_number(n, part_count) is None for n in numbers):
+        return {"error": f"Part numbers must be 1-{part_count}."}, 400
+
+    return {"urls": {
+        n: presign_part(claims["key"], claims["upload_id"], n)
+        for n in numbers
+    }}
+
+
+@app.post("/api/uploads/direct/parts/list")
+@login_required("Teacher")
+def direct_upload_list_parts():
+    """Parts already in S3, so an interrupted upload can resume."""
+    claims = _direct_claims(request.get_json() or {})
+    if not claims or "upload_id" not in claims:
+        return {"error": "Invalid upload token."}, 400
+    try:
+        return {"parts": list_uploaded_parts(claims["key"], claims["upload_id"])}
+    except ClientError:
+        return {"error": "Upload expired."}, 410
+
+
+@app.post("/api/uploads/direct/abort")
+@login_required("Teacher")
+def direct_upload_abort():
+    claims = _direct_claims(request.get_json() or {})
+    if claims and "upload_id" in claims:
+        try:
+            abort_multipart(claims["key"], claims["upload_id"])
+        except ClientError:
+            pass  # already completed or aborted
+    return {"ok": True}
+
+
+@app.post("/api/uploads/direct/complete")
+@login_required("Teacher")
+def direct_upload_complete():
+    data = request.get_json() or {}
+    claims = _direct_claims(data)
+    if not claims:
+        return {"error": "Invalid upload token."}, 400
+
+    # Retried completes return the row we already recorded
+    existing = db_find_upload_by_key(claims["key"], session["username"])
+    if existing:
+        return {"upload_id": existing["id"], "redirect": url_for("upload_done", upload_id=existing["id"])}
+
+    if "upload_id" in claims:
+        parts = data.get("parts")
+        part_count = claims.get("part_count", MAX_PARTS)
+        if not isinstance(parts, list) or not parts or not all(
+            isinstance(p, dict) and _part_number(p.get("PartNumber"), part_count) is not None
+            and isinstance(p.get("ETag"), str)
+            for p in parts
+        ):
+            return {"error": "Invalid part list."}, 400
+        try:
+            complete_multipart(claims["key"], claims["upload_id"], parts)
+        except ClientError as e:
+            return {"error": f"Could not complete upload: {e}"}, 400
+
+    size = object_size(claims["key"])
+    if size is None:
+        return {"error": "Upload not found in storage."}, 400
+    # Part uploads aren't size-limited by S3: check what actually arrived
+    if size > DIRECT_UPLOAD_MAX_BYTES or size != claims.get("size", size):
+        delete_file(claims["key"])
+        return {"error": "Uploaded file doesn't match the size given at start."}, 400
+
+    upload_id = db_add_upload({
+        "uploaded_by": session["username"],
+        "filename": claims["filename"],
+        "url": cloudfront_url(claims["key"]),
+        "tags": [],
+        "summary": None,
+        "size_bytes": size,
+        "status": "pending",
+        "s3_key": claims["key"]
+    })
+    # No local copy: the job fetches PDFs from S3 for text extraction
+    get_job_queue().enqueue(pipeline.PROCESS_UPLOAD, {"upload_id": upload_id})
+
+    return {"upload_id": upload_id, "redirect": url_for("upload_done", upload_id=upload_id)}
+
+
 # ======================================================
 # FILE SEARCH + FILTER (Student view)
 # ======================================================
 @app.route("/files")
 @login_required()
 def files_page():
-    files = db_get_uploads()
-
-    search = (request.args.get("search") or "").strip().lower()
+    search = (request.args.get("search") or "").strip()
     file_type = (request.args.get("type") or "all").lower()
-
-    # --- search ---
-    if search:
-        filtered = []
-        for f in files:
-            filename_match = search in f["filename"].lower()
-            tags_match = any(search in t.lower() for t in f.get("tags", []))
-            if filename_match or tags_match:
-                filtered.append(f)
-        files = filtered
-
-    # --- type filter ---
-    if file_type != "all":
-        def match(file):
-            name = file["filename"].lower()
-            if file_type == "pdf":
-                return name.endswith(".pdf")
-            if file_type == "image":
-                return any(name.endswith(e) for e in [".jpg", ".jpeg", ".png", ".gif"])
-            if file_type == "video":
-                return any(name.endswith(e) for e in [".mp4", ".mov", ".avi", ".mkv"])
-            if file_type == "doc":
-                return any(name.endswith(e) for e in [".doc", ".docx", ".txt", ".ppt", ".pptx", ".xls", ".xlsx"])
-            return True
-
-        files = [f for f in files if match(f)]
+    tag_query = request.args.getlist("tag")
+    tag_mode = "any" if request.args.get("tag_mode") == "any" else "all"
+    tags, tag_prefixes = parse_tag_query(tag_query)
+    limit = page_limit(request.args.get("limit"), FILES_PAGE_SIZE, PAGE_MAX)
+
+    files, next_cursor = db_list_uploads(
+        search=search,
+        kind=file_type,
+        tags=tags,
+        tag_prefixes=tag_prefixes,
+        tag_mode=tag_mode,
+        cursor=decode_cursor(request.args.get("cursor")),
+        limit=limit
+    )
 
     return render_template(
         "student_dashboard.html",
         files=files,
-        username=session["username"]
+        username=session["username"],
+        search=search,
+        file_type=file_type,
+        tag_query=", ".join(tag_query),
+        tag_mode=tag_mode,
+        next_cursor=next_cursor
+    )
+
+
+@app.route("/files/search")
+@login_required()
+def content_search_page():
+    """Full-text search inside PDF contents, ranked, with page snippets."""
+    query = (request.args.get("q") or "").strip()
+    limit = page_limit(request.args.get("limit"), FILES_PAGE_SIZE, PAGE_MAX)
+    cursor = decode_rank_cursor(request.args.get("cursor"))
+
+    results, next_cursor = search_contents(query, limit, cursor) if query else ([], None)
+
+    return render_template(
+        "content_search.html",
+        query=query,
+        results=results,
+        next_cursor=next_cursor
     )
 
 
@@ -333,19 +867,26 @@ def files_page():
 @app.route("/teacher/files")
 @login_required("Teacher")
 def teacher_files():
-    all_files = db_get_uploads()
-    mine = [f for f in all_files if f.get("uploaded_by") == session["username"]]
-    return render_template("teacher_files.html", files=mine)
+    files, next_cursor = db_list_uploads(
+        columns=TEACHER_FILE_COLUMNS,
+        uploaded_by=session["username"],
+        cursor=decode_cursor(request.args.get("cursor")),
+        limit=page_limit(request.args.get("limit"), FILES_PAGE_SIZE, PAGE_MAX)
+    )
+    return render_template(
+        "teacher_files.html",
+        files=files,
+        stats=db_owner_stats(session["username"]),
+        next_cursor=next_cursor
+    )
 
 
 @app.post("/teacher/files/delete/<filename>")
 @login_required("Teacher")
 def delete_teacher_file(filename):
-    # Delete from S3
-    delete_file(filename)
-
-    # Delete from DB
-    db_delete_upload(filename, session["username"])
+    # Delete from DB (owner-scoped), then the S3 objects those rows used
+    for key in db_delete_upload(filename, session["username"]):
+        delete_file(key)
 
     return redirect(url_for("teacher_files"))
 
@@ -357,11 +898,16 @@ def rename_teacher_file(filename):
     if not new_name:
         return redirect(url_for("teacher_files"))
 
-    # Generate fresh tags
-    new_tags = generate_ai_tags(new_name)
+    row = db_find_upload(filename, session["username"])
+    if row is None:
+        return redirect(url_for("teacher_files"))
+
+    # Fresh tags from the new name + the already extracted PDF text
+    new_tags = tag_weights(new_name, cached_text(row["content_hash"], pipeline.TAG_TEXT_CHARS))
 
-    # Rename in S3
-    rename_file(filename, new_name)
+    # Rename in S3 (legacy rows only -- generated keys don't depend on the filename)
+    if not row["s3_key"]:
+        rename_file(filename, new_name)
 
     # Update DB
     db_rename_upload(filename, new_name, session["username"], new_tags)
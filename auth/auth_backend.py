@@ -1,76 +1,122 @@
 # auth/auth_backend.py
-import hashlib
-from psycopg2.extras import RealDictCursor
-from db import get_db_connection
+from auth.passwords import check_password, get_password_pool, hash_password
+from db import db_cursor
+from utils.pagination import split_page
+from utils.user_cache import get_user_cache
 
-
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+ROLES = ("Student", "Teacher", "Admin")
 
 
 def signup_user(username: str, password: str, role: str):
-    """Create a new user in DB."""
+    """Create a new user in DB. Raises PasswordPoolBusy when sign-ins are saturated."""
     username = username.strip()
     role = role.strip()
 
     if not username or not password or not role:
         return False, "All fields are required."
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Check if username exists
-    cur.execute("SELECT 1 FROM users WHERE username = %s;", (username,))
-    if cur.fetchone():
-        cur.close()
-        conn.close()
-        return False, "❌ Username already exists!"
-
-    pwd_hash = hash_password(password)
+    pwd_hash = get_password_pool().run(hash_password, password)
 
-    cur.execute(
-        "INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s);",
-        (username, pwd_hash, role)
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    # One round trip; the UNIQUE(username) constraint settles concurrent signups
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s)
+            ON CONFLICT (username) DO NOTHING
+            RETURNING id;
+        """, (username, pwd_hash, role))
+        if cur.fetchone() is None:
+            return False, "❌ Username already exists!"
 
     return True, f"✅ Signup successful! You are registered as {role}."
 
 
 def login_user(username: str, password: str):
-    """Verify username/password and return user object."""
+    """
+    Verify username/password and return user object. Passwords stored with
+    an outdated scheme are re-hashed. Raises PasswordPoolBusy when sign-ins
+    are saturated.
+    """
     username = username.strip()
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("SELECT id, username, password_hash, role FROM users WHERE username = %s;", (username,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute(
+            "SELECT id, username, password_hash, role, version, disabled FROM users WHERE username = %s;",
+            (username,)
+        )
+        row = cur.fetchone()
 
     if not row:
         return False, "❌ User not found!", None
+    if row["disabled"]:
+        return False, "❌ This account has been disabled.", None
 
-    if row["password_hash"] != hash_password(password):
+    ok, new_hash = get_password_pool().run(check_password, password, row["password_hash"])
+    if not ok:
         return False, "⚠️ Incorrect password!", None
 
+    if new_hash:
+        with db_cursor() as cur:
+            cur.execute(
+                "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s;",
+                (new_hash, row["id"], row["password_hash"])
+            )
+
     user_info = {
         "id": row["id"],
         "username": row["username"],
-        "role": row["role"]
+        "role": row["role"],
+        "version": row["version"]
     }
     return True, "Login successful!", user_info
 
 
-def load_users():
-    """Return all users (for Admin dashboard)."""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT id, username, role, created_at FROM users ORDER BY created_at DESC;")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+def set_user_role(username: str, role: str) -> bool:
+    """Change a user's role; their current sessions are signed out."""
+    with db_cursor() as cur:
+        cur.execute(
+            "UPDATE users SET role = %s, version = version + 1 WHERE username = %s AND role <> %s;",
+            (role, username, role)
+        )
+        changed = cur.rowcount > 0
+    get_user_cache().invalidate(username)
+    return changed
+
+
+def revoke_user(username: str) -> bool:
+    """
+    Disable the account; open sessions stop working within USER_CACHE_TTL.
+    The row stays (uploads and logs keep their owner, and the username
+    can't be signed up again with a fresh version number).
+    """
+    with db_cursor() as cur:
+        cur.execute(
+            "UPDATE users SET disabled = TRUE, version = version + 1 WHERE username = %s AND NOT disabled;",
+            (username,)
+        )
+        revoked = cur.rowcount > 0
+    get_user_cache().invalidate(username)
+    return revoked
+
+
+def load_users_page(cursor=None, limit: int = 25):
+    """One page of users, newest first (for Admin dashboard). Returns (rows, next_cursor)."""
+    with db_cursor(dict_rows=True) as cur:
+        if cursor:
+            cur.execute("""
+                SELECT id, username, role, disabled, created_at FROM users
+                WHERE (created_at, id) < (%s, %s)
+                ORDER BY created_at DESC, id DESC LIMIT %s;
+            """, (*cursor, limit + 1))
+        else:
+            cur.execute("""
+                SELECT id, username, role, disabled, created_at FROM users
+                ORDER BY created_at DESC, id DESC LIMIT %s;
+            """, (limit + 1,))
+        rows = cur.fetchall()
+    return split_page(rows, limit, "created_at")
+
+
+def count_users() -> int:
+    with db_cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM users WHERE NOT disabled;")
+        return cur.fetchone()[0]
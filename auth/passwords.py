@@ -0,0 +1,195 @@
+# auth/passwords.py
+# Password hashing. Hashes are stored as
+#     <algorithm>$<params>$<salt b64>$<key b64>
+# e.g. "scrypt$n=16384,r=8,p=1$...$...", so each hash carries its own cost
+# and the settings can be raised without invalidating existing passwords.
+# Legacy rows hold a bare unsalted SHA-256 hex digest; they (and hashes made
+# with older settings) are re-hashed on the next successful login.
+#
+# KDF work runs in PasswordPool: a fixed number of threads (hashlib's scrypt
+# and pbkdf2_hmac release the GIL, so they run in parallel) behind a bounded
+# queue. When the queue is full, a login is rejected at once instead of
+# piling up and tying down web workers.
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "scrypt")                 # or "pbkdf2_sha256"
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))   # hashes in parallel per process
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "16"))     # waiting beyond the workers, then reject
+PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", "10"))       # seconds a caller waits for its hash
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class ScryptHasher:
+    algorithm = "scrypt"
+
+    def __init__(self, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P):
+        self.n, self.r, self.p = n, r, p
+
+    @classmethod
+    def from_params(cls, params: str):
+        kv = dict(item.split("=", 1) for item in params.split(","))
+        return cls(int(kv["n"]), int(kv["r"]), int(kv["p"]))
+
+    @property
+    def params(self) -> str:
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    def derive(self, password: str, salt: bytes) -> bytes:
+        # scrypt needs 128 * n * r * p bytes; the default 32 MB cap is too low for n >= 2**15
+        maxmem = 2 * 128 * self.n * self.r * self.p + (1 << 20)
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=self.n, r=self.r, p=self.p,
+                              maxmem=maxmem, dklen=KEY_BYTES)
+
+
+class PBKDF2Hasher:
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int = PASSWORD_PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    @classmethod
+    def from_params(cls, params: str):
+        return cls(int(params.split("=", 1)[1]))
+
+    @property
+    def params(self) -> str:
+        return f"i={self.iterations}"
+
+    def derive(self, password: str, salt: bytes) -> bytes:
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, self.iterations, KEY_BYTES)
+
+
+HASHERS = {cls.algorithm: cls for cls in (ScryptHasher, PBKDF2Hasher)}
+
+
+def get_hasher(name: str = PASSWORD_HASHER):
+    """The hasher new passwords are stored with (configured from the env)."""
+    return HASHERS[name]()
+
+
+def legacy_sha256(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def hash_password(password: str, hasher=None) -> str:
+    hasher = hasher or get_hasher()
+    salt = secrets.token_bytes(SALT_BYTES)
+    return f"{hasher.algorithm}${hasher.params}${_b64(salt)}${_b64(hasher.derive(password, salt))}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    if "$" not in encoded:
+        return hmac.compare_digest(legacy_sha256(password), encoded)
+    try:
+        algorithm, params, salt, key = encoded.split("$")
+        hasher = HASHERS[algorithm].from_params(params)
+    except (KeyError, ValueError):
+        return False   # unknown / malformed hash: never matches
+    return hmac.compare_digest(hasher.derive(password, _unb64(salt)), _unb64(key))
+
+
+def needs_rehash(encoded: str, hasher=None) -> bool:
+    hasher = hasher or get_hasher()
+    return not encoded.startswith(f"{hasher.algorithm}${hasher.params}$")
+
+
+def check_password(password: str, encoded: str):
+    """
+    (matches, new_hash). new_hash is set when the password matched but was
+    stored with a legacy or outdated scheme and should be replaced.
+    """
+    if not verify_password(password, encoded):
+        return False, None
+    return True, hash_password(password) if needs_rehash(encoded) else None
+
+
+# ------------------------------------------------------
+# Bounded worker pool
+# ------------------------------------------------------
+class PasswordPoolBusy(RuntimeError):
+    """Too many password hashes queued (or one took too long); try again shortly."""
+
+
+class PasswordPool:
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_queue: int = PASSWORD_QUEUE_MAX,
+                 timeout: float = PASSWORD_TIMEOUT):
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password")
+        # Running + queued tasks; one past this is rejected without waiting
+        self._slots = threading.BoundedSemaphore(self.workers + max(max_queue, 0))
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def run(self, fn, *args):
+        """fn(*args) on a pool thread; raises PasswordPoolBusy if the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy("Too many sign-ins in progress.")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordPoolBusy("Sign-in took too long.")
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_password_pool() -> PasswordPool:
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = PasswordPool()
+                _pool_pid = pid
+    return _pool
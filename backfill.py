@@ -0,0 +1,314 @@
+# backfill.py
+# Re-tag / re-summarize existing uploads after the tag vocabulary or the
+# summary prompts change:
+#
+#   python backfill.py retag                 # tags for every ready upload
+#   python backfill.py resummarize           # AI summaries for every ready PDF
+#   python backfill.py retag --dry-run       # compute only, report throughput
+#
+# Uploads are walked in id order, in keyset batches. Each batch is written
+# with one UPDATE ... FROM (VALUES ...) in the same transaction as the job's
+# checkpoint (backfill_checkpoints), so a crashed run resumes after the last
+# committed batch. Uploads that failed are kept in the checkpoint and retried
+# first by the next run. The checkpoint name includes a fingerprint of the
+# vocabulary / prompts: after another change the job starts from the top.
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from psycopg2.extras import execute_values
+
+from chatbot_backend import MODEL_NAME
+from db import db_cursor, init_db
+from utils.ai_client import TokenBucket
+from utils.ai_tags import TAG_VOCABULARY, tag_weights
+from utils.pdf_extract import load_cached_pages
+from utils.pdf_utils import (CHUNK_PROMPT, FINAL_PROMPT, REDUCE_PROMPT, SUMMARY_MAX_CHARS,
+                             chunk_pages, set_call_throttle, summarize_pages, summarize_pdf)
+from utils.storage_utils import download_to_temp
+from utils.tag_store import set_upload_tags_bulk
+from utils.upload_pipeline import TAG_TEXT_CHARS
+
+BACKFILL_BATCH = int(os.getenv("BACKFILL_BATCH", "500"))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 1)))
+BACKFILL_AI_CALLS_PER_MIN = float(os.getenv("BACKFILL_AI_CALLS_PER_MIN", "6"))   # leaves room for live traffic
+
+
+def fingerprint(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:12]
+
+
+# ------------------------------------------------------
+# Checkpoints
+# ------------------------------------------------------
+def load_checkpoint(job: str):
+    """(last_id, processed, failed_ids) of the job's last committed batch."""
+    with db_cursor() as cur:
+        cur.execute("SELECT last_id, processed, failed_ids FROM backfill_checkpoints WHERE job = %s;", (job,))
+        return cur.fetchone() or (0, 0, [])
+
+
+def save_checkpoint(cur, job: str, last_id: int, processed: int, failed_ids):
+    cur.execute("""
+        INSERT INTO backfill_checkpoints (job, last_id, processed, failed_ids) VALUES (%s, %s, %s, %s)
+        ON CONFLICT (job) DO UPDATE
+        SET last_id = EXCLUDED.last_id, processed = EXCLUDED.processed,
+            failed_ids = EXCLUDED.failed_ids, updated_at = NOW();
+    """, (job, last_id, processed, sorted(failed_ids)))
+
+
+def reset_checkpoint(job: str):
+    with db_cursor() as cur:
+        cur.execute("DELETE FROM backfill_checkpoints WHERE job = %s;", (job,))
+
+
+# ------------------------------------------------------
+# Reading
+# ------------------------------------------------------
+def iter_batches(after_id: int, batch_size: int, pdf_only: bool = False, only_ids=None):
+    """
+    Ready uploads with id > after_id, `batch_size` at a time (keyset, id
+    order); only those in only_ids when given.
+    """
+    filters, params = "", []
+    if pdf_only:
+        filters += " AND u.kind = 'pdf'"
+    if only_ids is not None:
+        filters += " AND u.id = ANY(%s)"
+        params.append(list(only_ids))
+    while True:
+        with db_cursor(dict_rows=True) as cur:
+            cur.execute(f"""
+                SELECT u.id, u.filename, u.content_hash, u.summary,
+                       (SELECT json_object_agg(t.name, ut.weight)
+                        FROM upload_tags ut JOIN tags t ON t.id = ut.tag_id
+                        WHERE ut.upload_id = u.id) AS weights
+                FROM uploads u
+                WHERE u.id > %s AND u.status = 'ready'{filters}
+                ORDER BY u.id
+                LIMIT %s;
+            """, (after_id, *params, batch_size))
+            rows = cur.fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1]["id"]
+
+
+def load_texts(content_hashes, max_chars: int) -> dict:
+    """{content_hash: first max_chars of its extracted PDF text} for one batch."""
+    hashes = list({h for h in content_hashes if h})
+    if not hashes:
+        return {}
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT content_hash, left(string_agg(text, E'\\n' ORDER BY page_no), %s)
+            FROM pdf_pages
+            WHERE content_hash = ANY(%s)
+            GROUP BY content_hash;
+        """, (max_chars, hashes))
+        return dict(cur.fetchall())
+
+
+def load_pages(content_hash: str, max_chars: int):
+    """Cached page texts (up to max_chars), or None if the pages aren't all cached."""
+    cached = load_cached_pages(content_hash) if content_hash else {}
+    if not cached or sorted(cached) != list(range(len(cached))):
+        return None
+    pages, total = [], 0
+    for i in range(len(cached)):
+        pages.append(cached[i])
+        total += len(cached[i])
+        if total >= max_chars:
+            break
+    return pages
+
+
+# ------------------------------------------------------
+# Jobs
+# ------------------------------------------------------
+def _same_tags(old, new) -> bool:
+    old = old or {}
+    return old.keys() == new.keys() and all(abs(old[t] - w) < 1e-3 for t, w in new.items())
+
+
+def retag(args, stats):
+    with open(TAG_VOCABULARY, "rb") as f:
+        job = f"retag:{fingerprint(f.read())}"
+    pool = None
+    if args.workers > 1:
+        # spawn, as in utils/pdf_extract.py; each worker compiles the vocabulary once
+        pool = ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        run(job, args, stats, lambda rows: _retag_batch(rows, pool, args.workers))
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+def _retag_batch(rows, pool, workers: int):
+    """Returns (changed rows, writer, failed ids) for one batch."""
+    texts = load_texts([r["content_hash"] for r in rows], TAG_TEXT_CHARS)
+    names = [r["filename"] for r in rows]
+    docs = [texts.get(r["content_hash"]) for r in rows]
+    if pool:
+        results = list(pool.map(tag_weights, names, docs, chunksize=max(len(rows) // (4 * workers), 1)))
+    else:
+        results = list(map(tag_weights, names, docs))
+
+    changed = [(r["id"], w) for r, w in zip(rows, results) if not _same_tags(r["weights"], w)]
+
+    def write(cur):
+        if not changed:
+            return
+        execute_values(cur, """
+            UPDATE uploads u SET tags = v.tags
+            FROM (VALUES %s) AS v(id, tags)
+            WHERE u.id = v.id;
+        """, [(upload_id, ",".join(w)) for upload_id, w in changed], template="(%s::int, %s::text)")
+        set_upload_tags_bulk(cur, changed)
+
+    return changed, write, []
+
+
+def ai_calls(pages) -> int:
+    """AI calls summarize_pages makes for these pages (merges of many parts may add a few)."""
+    chunks = len(chunk_pages(pages))
+    return chunks if chunks <= 1 else chunks + 1
+
+
+def resummarize(args, stats):
+    job = f"resummarize:{fingerprint(MODEL_NAME, FINAL_PROMPT, CHUNK_PROMPT, REDUCE_PROMPT)}"
+    # Paces every AI call (a long PDF makes one per chunk plus the merge), not every PDF
+    bucket = TokenBucket(args.ai_calls_per_min / 60.0, 1)
+    set_call_throttle(lambda: bucket.acquire(float("inf")))
+
+    def summarize(row):
+        pages = load_pages(row["content_hash"], SUMMARY_MAX_CHARS)
+        if pages is not None:
+            return summarize_pages(pages)
+        # Not extracted yet (e.g. uploaded before the page cache existed)
+        with db_cursor() as cur:
+            cur.execute("SELECT COALESCE(s3_key, filename) FROM uploads WHERE id = %s;", (row["id"],))
+            key = cur.fetchone()[0]
+        path = download_to_temp(key, ".pdf")
+        try:
+            return summarize_pdf(path, row["content_hash"])
+        finally:
+            os.remove(path)
+
+    def batch(rows):
+        if args.dry_run:
+            # No AI calls: report what a real run would have to do
+            for row in rows:
+                pages = load_pages(row["content_hash"], SUMMARY_MAX_CHARS)
+                stats["ai_calls"] += ai_calls(pages) if pages is not None else 1
+            return rows, None, []
+        changed, failed = [], []
+        for row in rows:
+            try:
+                summary = summarize(row)
+            except Exception as e:
+                failed.append(row["id"])
+                print(f"  upload {row['id']} ({row['filename']}) failed => {type(e).__name__}: {e}")
+                continue
+            if summary and summary != row["summary"]:
+                changed.append((row["id"], summary))
+
+        def write(cur):
+            if changed:
+                execute_values(cur, """
+                    UPDATE uploads u SET summary = v.summary
+                    FROM (VALUES %s) AS v(id, summary)
+                    WHERE u.id = v.id;
+                """, changed, template="(%s::int, %s::text)")
+
+        return changed, write, failed
+
+    try:
+        run(job, args, stats, batch, pdf_only=True)
+    finally:
+        set_call_throttle(None)
+
+
+def run(job: str, args, stats, process_batch, pdf_only: bool = False):
+    """
+    process_batch(rows) -> (changed, write(cur) or None, failed ids). Failed
+    uploads are stored with the checkpoint and retried first by the next run.
+    """
+    if args.restart and not args.dry_run:
+        reset_checkpoint(job)
+    last_id, processed, failed = (0, 0, []) if args.dry_run else load_checkpoint(job)
+    if last_id:
+        print(f"{job}: resuming after upload {last_id} ({processed} done)")
+
+    def do_batch(rows, retry: bool, pending):
+        nonlocal processed
+        started = time.perf_counter()
+        changed, write, batch_failed = process_batch(rows)
+        failed.extend(batch_failed)
+        stats["failed"].extend(batch_failed)
+        if not retry:
+            processed += len(rows)
+        if write and not args.dry_run:
+            with db_cursor() as cur:   # one transaction: batch + checkpoint
+                write(cur)
+                save_checkpoint(cur, job, last_id if retry else rows[-1]["id"], processed,
+                                failed + sorted(pending))
+
+        stats["rows"] += len(rows)
+        stats["changed"] += len(changed)
+        stats["batches"] += 1
+        print(f"  {'retried' if retry else 'batch up to id'} {rows[-1]['id']}: {len(rows)} rows, "
+              f"{len(changed)} changed, {len(batch_failed)} failed, {time.perf_counter() - started:.2f}s")
+
+    # Uploads that failed last time, before moving on
+    if failed:
+        print(f"{job}: retrying {len(failed)} uploads that failed before")
+        pending, failed = set(failed), []
+        for rows in iter_batches(0, args.batch, pdf_only, only_ids=pending):
+            pending -= {r["id"] for r in rows}
+            do_batch(rows, True, pending)
+
+    for rows in iter_batches(last_id, args.batch, pdf_only):
+        do_batch(rows, False, ())
+        last_id = rows[-1]["id"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-tag / re-summarize existing uploads.")
+    parser.add_argument("job", choices=["retag", "resummarize"])
+    parser.add_argument("--batch", type=int, default=BACKFILL_BATCH, help="uploads per batch")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="tagging processes")
+    parser.add_argument("--ai-calls-per-min", type=float, default=BACKFILL_AI_CALLS_PER_MIN,
+                        help="resummarize: AI calls per minute (a long PDF needs several)")
+    parser.add_argument("--dry-run", action="store_true", help="compute but don't write; report throughput")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the top")
+    args = parser.parse_args(argv)
+
+    init_db()
+    stats = {"rows": 0, "changed": 0, "batches": 0, "failed": [], "ai_calls": 0}
+    started = time.perf_counter()
+    (retag if args.job == "retag" else resummarize)(args, stats)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{args.job}{' (dry run)' if args.dry_run else ''}: {stats['rows']} uploads in "
+          f"{stats['batches']} batches, {stats['changed']} "
+          f"{'to update' if args.dry_run else 'updated'}, {elapsed:.1f}s "
+          f"({stats['rows'] / elapsed if elapsed else 0:.0f} uploads/s)")
+    if args.job == "resummarize" and args.dry_run and stats["rows"]:
+        minutes = stats["ai_calls"] / args.ai_calls_per_min
+        print(f"~{stats['ai_calls']} AI calls: at {args.ai_calls_per_min:g}/min a real run takes ~{minutes:.1f} min.")
+    if stats["failed"]:
+        print(f"Failed uploads (left unchanged, retried by the next run): {stats['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_passwords.py
+# Logins/sec per password-hash cost setting, to pick PASSWORD_* values for
+# the hardware the app runs on:
+#
+#   python bench_passwords.py                     # default settings, 5s each
+#   python bench_passwords.py --seconds 10 --workers 4 --clients 32
+#
+# Each setting is verified by `--clients` concurrent callers through a
+# PasswordPool like the one /login uses, so queue rejections show up too.
+import argparse
+import os
+import threading
+import time
+
+from auth.passwords import (PBKDF2Hasher, PasswordPool, PasswordPoolBusy, ScryptHasher,
+                            PASSWORD_QUEUE_MAX, PASSWORD_WORKERS, hash_password, legacy_sha256,
+                            verify_password)
+
+SETTINGS = [
+    ("sha256 (legacy)", None),
+    ("scrypt n=2^13", ScryptHasher(n=2 ** 13)),
+    ("scrypt n=2^14", ScryptHasher(n=2 ** 14)),
+    ("scrypt n=2^15", ScryptHasher(n=2 ** 15)),
+    ("pbkdf2 200k", PBKDF2Hasher(200_000)),
+    ("pbkdf2 600k", PBKDF2Hasher(600_000)),
+]
+
+
+def bench(hasher, seconds: float, workers: int, queue_max: int, clients: int):
+    password = "correct horse battery staple"
+    encoded = hash_password(password, hasher) if hasher else legacy_sha256(password)
+
+    started = time.perf_counter()
+    verify_password(password, encoded)
+    single_ms = (time.perf_counter() - started) * 1000
+
+    pool = PasswordPool(workers, queue_max, timeout=60)
+    counts = {"ok": 0, "busy": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < stop_at:
+            try:
+                pool.run(verify_password, password, encoded)
+                key = "ok"
+            except PasswordPoolBusy:
+                key = "busy"
+                time.sleep(0.01)   # a rejected browser would retry later
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return single_ms, counts["ok"] / elapsed, counts["busy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark password hash settings.")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=PASSWORD_WORKERS)
+    parser.add_argument("--queue", type=int, default=PASSWORD_QUEUE_MAX)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent login attempts")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.workers} workers, queue {args.queue}, {args.clients} clients\n")
+    print(f"{'setting':<18} {'1 verify':>10} {'logins/s':>10} {'rejected':>10}")
+    for name, hasher in SETTINGS:
+        single_ms, rate, busy = bench(hasher, args.seconds, args.workers, args.queue, args.clients)
+        print(f"{name:<18} {single_ms:>8.1f}ms {rate:>10.1f} {busy:>10}")
+
+
+if __name__ == "__main__":
+    main()
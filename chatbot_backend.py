@@ -1,18 +1,59 @@
-import google.generativeai as genai
-import os
 from dotenv import load_dotenv
 
+from utils.ai_cache import get_response_cache
+from utils.ai_client import get_ai_client, AI_MODEL
+
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+MODEL_NAME = AI_MODEL
+
+# Deadlines, rate limiting, coalescing and retries live in the client
+client = get_ai_client(MODEL_NAME)
 
-def ask_ai(question: str):
+def ask_ai(question: str, use_cache: bool = True):
+    """use_cache=False neither reads nor fills the response cache (one-off prompts)."""
     if not question.strip():
         return "Please type a question."
 
+    # Repeated questions are answered from the cache
+    cache = get_response_cache(MODEL_NAME) if use_cache else None
+    if cache is not None:
+        cached = cache.get(question, MODEL_NAME)
+        if cached is not None:
+            return cached
+
     try:
-        response = model.generate_content(question)
-        return response.text.strip()
+        answer = client.generate(question).strip()
     except Exception as e:
         return f"AI Error: {e}"
+
+    if cache is not None:
+        cache.set(question, MODEL_NAME, answer)
+    return answer
+
+
+def ask_ai_stream(question: str, use_cache: bool = True):
+    """Like ask_ai, but yields the answer in pieces as Gemini generates it."""
+    if not question.strip():
+        yield "Please type a question."
+        return
+
+    cache = get_response_cache(MODEL_NAME) if use_cache else None
+    if cache is not None:
+        cached = cache.get(question, MODEL_NAME)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    try:
+        for text in client.stream(question):
+            parts.append(text)
+            yield text
+    except Exception as e:
+        yield f"AI Error: {e}"
+        return
+
+    answer = "".join(parts).strip()
+    if answer and cache is not None:
+        cache.set(question, MODEL_NAME, answer)
@@ -1,35 +1,32 @@
 import customtkinter as ctk
 import os
-import json
+import threading
 from tkinter import messagebox
-import boto3
 from dotenv import load_dotenv
 
+from dashboard.virtual_list import VirtualList
+from utils.catalogue_cache import get_catalogue
+from utils.s3_helper import get_s3_client
+
 # -------------------------------------------------
 # LOAD ENVIRONMENT
 # -------------------------------------------------
 load_dotenv()
 
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 BUCKET_NAME = os.getenv("S3_BUCKET")
-REGION = os.getenv("AWS_DEFAULT_REGION")
 CLOUDFRONT_DOMAIN = os.getenv("CLOUDFRONT_DOMAIN")
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 USERS_FILE = os.path.join(BASE_DIR, "users.json")
 UPLOADS_FILE = os.path.join(BASE_DIR, "uploads.json")
 
+UPLOAD_ROW_HEIGHT = 110     # px per row in "View Uploaded Files" (four lines of text)
+
 # -------------------------------------------------
 # AWS S3 CLIENT
 # -------------------------------------------------
 try:
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=REGION
-    )
+    s3 = get_s3_client()
 except Exception:
     s3 = None
 
@@ -71,30 +68,27 @@ class AdminDashboard(ctk.CTk):
         ctk.CTkButton(self, text="📊 View System Statistics", width=250,
                       command=self.show_stats).pack(pady=10)
 
-        ctk.CTkButton(self, text="🔄 Verify Cloud Sync", width=250,
-                      command=self.verify_cloud_sync).pack(pady=10)
+        self.sync_button = ctk.CTkButton(self, text="🔄 Verify Cloud Sync", width=250,
+                                         command=self.verify_cloud_sync)
+        self.sync_button.pack(pady=10)
 
         ctk.CTkButton(self, text="🚪 Logout", width=250, fg_color="red",
                       command=self.logout).pack(pady=20)
 
     # -------------------------------------------------
-    # LOAD JSON FILES
+    # LOCAL CATALOGUE (JSON files re-read only when they change)
     # -------------------------------------------------
-    def load_json(self, file_path):
-        if not os.path.exists(file_path):
-            return []
-
-        try:
-            with open(file_path, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
+    def catalogue(self):
+        catalogue = get_catalogue()
+        catalogue.sync_users_json(USERS_FILE)
+        catalogue.sync_uploads_json(UPLOADS_FILE)
+        return catalogue
 
     # -------------------------------------------------
     # SHOW USERS
     # -------------------------------------------------
     def show_users(self):
-        users = self.load_json(USERS_FILE)
+        users = self.catalogue().users()
 
         if not users:
             messagebox.showinfo("Users", "No registered users found!")
@@ -113,8 +107,7 @@ class AdminDashboard(ctk.CTk):
         scroll = ctk.CTkScrollableFrame(win, width=700, height=350)
         scroll.pack(pady=10)
 
-        for username, info in users.items():
-            role = info.get("role", "Unknown")
+        for username, role in users:
             ctk.CTkLabel(
                 scroll,
                 text=f"• {username}  ( {role} )",
@@ -125,7 +118,7 @@ class AdminDashboard(ctk.CTk):
     # SHOW UPLOADED FILES
     # -------------------------------------------------
     def show_uploads(self):
-        uploads = self.load_json(UPLOADS_FILE)
+        uploads = self.catalogue().recorded_uploads()
 
         if not uploads:
             messagebox.showinfo("Uploads", "No uploaded files found!")
@@ -141,50 +134,44 @@ class AdminDashboard(ctk.CTk):
             font=("Arial Rounded MT Bold", 22)
         ).pack(pady=15)
 
-        scroll = ctk.CTkScrollableFrame(win, width=800, height=400)
-        scroll.pack(pady=10)
-
-        for file in reversed(uploads):
-            tags = ", ".join(file.get("tags", []))
-
-            url = file.get("url", "")
-            filename = file.get("filename", "")
-
-            # Replace S3 link with CloudFront for display
-            if CLOUDFRONT_DOMAIN:
-                preview_url = f"https://{CLOUDFRONT_DOMAIN}/{filename}"
-            else:
-                preview_url = url
-
-            ctk.CTkLabel(
-                scroll,
-                text=(
-                    f"📄 {filename}\n"
-                    f"🕒 {file['uploaded_on']}\n"
-                    f"🏷️ Tags: {tags}\n"
-                    f"🔗 {preview_url}"
-                ),
-                font=("Arial", 13),
-                wraplength=750,
-                justify="left"
-            ).pack(anchor="w", padx=20, pady=10)
+        # Only the rows on screen exist; they are re-filled as the list scrolls
+        upload_list = VirtualList(win, UPLOAD_ROW_HEIGHT, self.make_upload_row, self.fill_upload_row,
+                                  width=800, height=400)
+        upload_list.pack(pady=10, fill="both", expand=True)
+        upload_list.set_rows(uploads)
+
+    def make_upload_row(self, parent):
+        label = ctk.CTkLabel(parent, text="", font=("Arial", 13), wraplength=750, justify="left")
+        label.pack(anchor="w", padx=20, pady=10)
+        return label
+
+    def fill_upload_row(self, label, row: tuple):
+        filename, url, uploaded_on, tags = row
+
+        # Replace S3 link with CloudFront for display
+        if CLOUDFRONT_DOMAIN:
+            preview_url = f"https://{CLOUDFRONT_DOMAIN}/{filename}"
+        else:
+            preview_url = url
+
+        label.configure(text=(
+            f"📄 {os.path.basename(filename)}\n"
+            f"🕒 {uploaded_on}\n"
+            f"🏷️ Tags: {tags}\n"
+            f"🔗 {preview_url}"
+        ))
 
     # -------------------------------------------------
     # SYSTEM STATISTICS
     # -------------------------------------------------
     def show_stats(self):
-        users = self.load_json(USERS_FILE)
-        uploads = self.load_json(UPLOADS_FILE)
+        catalogue = self.catalogue()
+        counts = catalogue.role_counts()
 
-        total_users = len(users)
-        roles = {"Student": 0, "Teacher": 0, "Admin": 0}
+        total_users = sum(counts.values())
+        roles = {r: counts.get(r, 0) for r in ("Student", "Teacher", "Admin")}
 
-        for u in users.values():
-            r = u.get("role", "")
-            if r in roles:
-                roles[r] += 1
-
-        total_uploads = len(uploads)
+        total_uploads = catalogue.recorded_upload_count()
 
         win = ctk.CTkToplevel(self)
         win.title("System Statistics")
@@ -210,26 +197,34 @@ class AdminDashboard(ctk.CTk):
             messagebox.showwarning("AWS", "AWS S3 is not configured!")
             return
 
-        try:
-            resp = s3.list_objects_v2(Bucket=BUCKET_NAME)
-            cloud_files = [obj["Key"] for obj in resp.get("Contents", [])]
-            local_files = [f["filename"] for f in self.load_json(UPLOADS_FILE)]
-
-            missing = [f for f in local_files if f not in cloud_files]
-
-            if missing:
-                messagebox.showwarning(
-                    "Sync Issue",
-                    f"⚠️ Missing files in S3:\n{', '.join(missing)}"
-                )
-            else:
-                messagebox.showinfo(
-                    "Sync Success",
-                    "✅ All uploaded files exist in AWS S3!"
-                )
+        # Listing a large bucket takes a while: do it off the UI thread
+        self.sync_button.configure(state="disabled", text="🔄 Checking…")
+        threading.Thread(target=self._sync_worker, daemon=True).start()
 
+    def _sync_worker(self):
+        try:
+            # Brings the cached listing up to date (only changed keys are re-tagged)
+            catalogue = self.catalogue()
+            catalogue.sync_s3(s3, BUCKET_NAME)
+            self.after(0, self._sync_done, catalogue.missing_from_bucket(BUCKET_NAME), None)
         except Exception as e:
-            messagebox.showerror("Sync Error", f"Failed to check cloud sync.\n{e}")
+            self.after(0, self._sync_done, None, e)
+
+    def _sync_done(self, missing, error):
+        self.sync_button.configure(state="normal", text="🔄 Verify Cloud Sync")
+
+        if error is not None:
+            messagebox.showerror("Sync Error", f"Failed to check cloud sync.\n{error}")
+        elif missing:
+            messagebox.showwarning(
+                "Sync Issue",
+                f"⚠️ Missing files in S3:\n{', '.join(missing)}"
+            )
+        else:
+            messagebox.showinfo(
+                "Sync Success",
+                "✅ All uploaded files exist in AWS S3!"
+            )
 
     # -------------------------------------------------
     # LOGOUT
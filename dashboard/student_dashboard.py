@@ -1,59 +1,27 @@
 import customtkinter as ctk
 import os
+import threading
 import webbrowser
-import boto3
 from dotenv import load_dotenv
 from tkinter import messagebox
 
+from dashboard.virtual_list import VirtualList
+from utils.catalogue_cache import get_catalogue
+from utils.s3_helper import get_s3_client, TRANSFER_CONFIG
+
 # ----------------------------
 # Load ENV
 # ----------------------------
 load_dotenv()
 
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 BUCKET_NAME = os.getenv("S3_BUCKET")
-REGION = os.getenv("AWS_DEFAULT_REGION")
 CLOUDFRONT_DOMAIN = os.getenv("CLOUDFRONT_DOMAIN")  # e.g. dbci5xyzb8tw6.cloudfront.net
 
-# S3 client
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION
-)
-
+# S3 client (shared, pooled)
+s3 = get_s3_client()
 
-# ----------------------------
-# Tag helper (same logic as teacher)
-# ----------------------------
-def generate_ai_tags(filename: str):
-    name = filename.lower()
-    tags = set()
-
-    if "python" in name:
-        tags.update(["Python", "Programming"])
-    if "c " in name or name.startswith("c_") or " c" in name:
-        tags.update(["C Language", "Coding"])
-    if "dsa" in name or "data" in name:
-        tags.update(["Data Structures", "Algorithms"])
-    if "sql" in name or "db" in name:
-        tags.update(["SQL", "Database"])
-    if "ai" in name or "ml" in name:
-        tags.update(["AI", "Machine Learning"])
-    if "cloud" in name:
-        tags.update(["Cloud", "AWS"])
-    if "network" in name:
-        tags.update(["Networking"])
-    if "java" in name:
-        tags.update(["Java", "OOP"])
-    if "os" in name:
-        tags.update(["Operating System"])
-    if not tags:
-        tags.update(["General Study Material"])
-
-    return list(tags)
+CARD_HEIGHT = 140           # px per file row in the list
+RELIST_DELAY_MS = 500       # while a refresh runs, redraw at most this often
 
 
 def guess_mime_type(filename: str) -> str | None:
@@ -115,7 +83,7 @@ class StudentDashboard(ctk.CTk):
         ctk.CTkButton(
             search_frame,
             text="Show All",
-            command=self.refresh_list
+            command=self.show_all
         ).pack(side="left", padx=5)
 
         ctk.CTkLabel(
@@ -133,190 +101,159 @@ class StudentDashboard(ctk.CTk):
         )
         self.filter_menu.pack(pady=5)
 
+        self.status_label = ctk.CTkLabel(self, text="", font=("Arial", 12))
+        self.status_label.pack()
+
         # ---------------- Scroll area ----------------
-        self.list_frame = ctk.CTkScrollableFrame(self, width=850, height=360)
-        self.list_frame.pack(pady=10, padx=10, fill="both", expand=True)
+        # Only the cards on screen exist; they are re-filled as the list scrolls
+        self.file_list = VirtualList(self, CARD_HEIGHT, self.make_file_card, self.fill_file_card,
+                                     width=850, height=360)
+        self.file_list.pack(pady=10, padx=10, fill="both", expand=True)
 
         # ---------------- Bottom buttons ----------------
-        ctk.CTkButton(self, text="Refresh", command=self.refresh_list).pack(pady=5)
+        ctk.CTkButton(self, text="Refresh", command=self.fetch_files).pack(pady=5)
         ctk.CTkButton(self, text="💬 Chat Assistant", command=self.open_chatbot).pack(pady=5)
         ctk.CTkButton(self, text="Logout", fg_color="#b00020", hover_color="#d32f2f",
                       command=self.logout).pack(pady=10)
 
-        self.refresh_list()
+        # The list is drawn from the local catalogue; a refresh only syncs S3 changes into it
+        self.catalogue = get_catalogue()
+        self.query = ""
+        self._listing = False
+        self._generation = 0
+        self._relist_scheduled = False
+
+        self.render_list()
+        self.fetch_files()
 
     # -------------------------------------------------
     # Fetch S3 Files
     # -------------------------------------------------
     def fetch_files(self):
-        try:
-            resp = s3.list_objects_v2(Bucket=BUCKET_NAME)
-            if "Contents" not in resp:
-                return []
-
-            files = []
-            for obj in resp["Contents"]:
-                fname = obj["Key"]
-                uploaded_on = obj["LastModified"].strftime("%Y-%m-%d %H:%M")
-
-                # Build preview URL:
-                # 1) Prefer CloudFront
-                # 2) Fallback to presigned S3 URL
-                if CLOUDFRONT_DOMAIN:
-                    url = f"https://{CLOUDFRONT_DOMAIN}/{fname}"
-                else:
-                    mime = guess_mime_type(fname)
-                    params = {"Bucket": BUCKET_NAME, "Key": fname}
-                    if mime:
-                        params["ResponseContentType"] = mime
-                        params["ResponseContentDisposition"] = "inline"
-                    url = s3.generate_presigned_url(
-                        "get_object",
-                        Params=params,
-                        ExpiresIn=3600
-                    )
-
-                tags = generate_ai_tags(fname)
-
-                files.append({
-                    "filename": fname,
-                    "uploaded_on": uploaded_on,
-                    "url": url,
-                    "tags": tags,
-                })
-            return files
+        """Sync the bucket into the catalogue in a worker thread; changes are shown as they arrive."""
+        self._generation += 1
+        self._listing = True
+        self.status_label.configure(text=f"{self.catalogue.object_count(BUCKET_NAME)} materials · checking for changes…")
+        threading.Thread(target=self._list_worker, args=(self._generation,), daemon=True).start()
 
+    def _list_worker(self, generation: int):
+        try:
+            self.catalogue.sync_s3(
+                s3, BUCKET_NAME,
+                on_page=lambda changed: self.after(0, self._files_changed, generation),
+                cancelled=lambda: generation != self._generation,
+            )
+            self.after(0, self._listing_done, generation, None)
         except Exception as e:
-            messagebox.showerror("AWS Error", f"Failed to fetch files from S3:\n{e}")
-            return []
+            self.after(0, self._listing_done, generation, e)
 
-    # -------------------------------------------------
-    # UI List Handling
-    # -------------------------------------------------
-    def refresh_list(self, *args):
-        for w in self.list_frame.winfo_children():
-            w.destroy()
-
-        all_files = self.fetch_files()
-        if not all_files:
-            ctk.CTkLabel(
-                self.list_frame,
-                text="No materials uploaded yet.",
-                font=("Arial", 16)
-            ).pack(pady=20)
+    def _files_changed(self, generation: int):
+        if generation != self._generation or self._relist_scheduled:
             return
+        self._relist_scheduled = True
+        self.after(RELIST_DELAY_MS, self._relist)
+
+    def _relist(self):
+        self._relist_scheduled = False
+        self.render_list(keep_scroll=True)
 
-        file_type = self.filter_var.get()
-        filtered = []
-
-        for f in all_files:
-            ext = os.path.splitext(f["filename"])[1].lower()
-
-            if file_type == "PDF" and ext == ".pdf":
-                filtered.append(f)
-            elif file_type == "Video" and ext in [".mp4", ".avi", ".mov"]:
-                filtered.append(f)
-            elif file_type == "Image" and ext in [".png", ".jpg", ".jpeg"]:
-                filtered.append(f)
-            elif file_type == "Other" and ext not in [".pdf", ".mp4", ".avi", ".mov", ".png", ".jpg", ".jpeg"]:
-                filtered.append(f)
-            elif file_type == "All":
-                filtered.append(f)
-
-        if not filtered:
-            ctk.CTkLabel(
-                self.list_frame,
-                text="No files found for this filter.",
-                font=("Arial", 14)
-            ).pack(pady=20)
+    def _listing_done(self, generation: int, error):
+        if generation != self._generation:
             return
+        self._listing = False
+        total = self.catalogue.object_count(BUCKET_NAME)
+        if error is not None:
+            self.status_label.configure(text=f"{total} materials (cached)")
+            messagebox.showerror("AWS Error", f"Failed to fetch files from S3:\n{error}")
+        else:
+            self.status_label.configure(text=f"{total} materials")
+        self.render_list(keep_scroll=True)
+
+    # -------------------------------------------------
+    # UI List Handling
+    # -------------------------------------------------
+    def render_list(self, keep_scroll: bool = False):
+        """Show the catalogue rows matching the filter and search (no S3 call)."""
+        rows = self.catalogue.objects(BUCKET_NAME, self.filter_var.get(), self.query)
+        self.file_list.set_rows(rows, empty_text=self._empty_message(), keep_scroll=keep_scroll)
+
+    def _empty_message(self) -> str:
+        if self._listing:
+            return "Loading materials…"
+        if not self.catalogue.object_count(BUCKET_NAME):
+            return "No materials uploaded yet."
+        if self.query:
+            return "No results found."
+        return "No files found for this filter."
 
-        for f in filtered:
-            self.add_file_card(f)
+    def refresh_list(self, *args):
+        """Filter changed: redraw from the catalogue."""
+        self.render_list()
 
-    def add_file_card(self, file_info: dict):
-        frame = ctk.CTkFrame(self.list_frame, corner_radius=10)
-        frame.pack(fill="x", padx=15, pady=8)
+    def show_all(self):
+        self.search_entry.delete(0, "end")
+        self.query = ""
+        self.render_list()
 
-        tags_text = ", ".join(file_info.get("tags", []))
+    def make_file_card(self, parent) -> dict:
+        frame = ctk.CTkFrame(parent, corner_radius=10)
+        frame.pack(fill="both", expand=True, padx=15, pady=4)
 
-        ctk.CTkLabel(
-            frame,
-            text=f"📄 {file_info['filename']}",
-            font=("Arial Rounded MT Bold", 15)
-        ).pack(anchor="w", padx=10, pady=(6, 2))
+        card = {"row": None}
+        card["name"] = ctk.CTkLabel(frame, text="", font=("Arial Rounded MT Bold", 15))
+        card["name"].pack(anchor="w", padx=10, pady=(6, 2))
 
-        ctk.CTkLabel(
-            frame,
-            text=f"Uploaded: {file_info['uploaded_on']}",
-            font=("Arial", 11)
-        ).pack(anchor="w", padx=10)
+        card["uploaded"] = ctk.CTkLabel(frame, text="", font=("Arial", 11))
+        card["uploaded"].pack(anchor="w", padx=10)
 
-        ctk.CTkLabel(
-            frame,
-            text=f"AI Tags: {tags_text}",
-            font=("Arial", 11),
-            text_color="#00bcd4"
-        ).pack(anchor="w", padx=10, pady=(0, 4))
+        card["tags"] = ctk.CTkLabel(frame, text="", font=("Arial", 11), text_color="#00bcd4")
+        card["tags"].pack(anchor="w", padx=10, pady=(0, 4))
 
         btns = ctk.CTkFrame(frame)
         btns.pack(anchor="e", padx=10, pady=6)
 
+        # The buttons act on whichever file the card is showing at the time
         ctk.CTkButton(
             btns,
             text="Preview",
             width=100,
-            command=lambda fname=file_info["filename"]: self.preview_file(fname)
+            command=lambda: self.preview_file(card["row"][0])
         ).pack(side="left", padx=5)
 
         ctk.CTkButton(
             btns,
             text="Download",
             width=100,
-            command=lambda fname=file_info["filename"]: self.download_file(fname)
+            command=lambda: self.download_file(card["row"][0])
         ).pack(side="left", padx=5)
+        return card
+
+    def fill_file_card(self, card: dict, row: tuple):
+        key, filename, uploaded_on, tags = row
+        card["row"] = row
+        card["name"].configure(text=f"📄 {filename}")
+        card["uploaded"].configure(text=f"Uploaded: {uploaded_on}")
+        card["tags"].configure(text=f"AI Tags: {tags}")
 
     # -------------------------------------------------
     # Search
     # -------------------------------------------------
     def search_files(self):
-        query = self.search_entry.get().lower().strip()
-        if not query:
-            self.refresh_list()
-            return
-
-        files = self.fetch_files()
-
-        for w in self.list_frame.winfo_children():
-            w.destroy()
-
-        results = []
-        for f in files:
-            if query in f["filename"].lower() or query in " ".join(f["tags"]).lower():
-                results.append(f)
-
-        if not results:
-            ctk.CTkLabel(
-                self.list_frame,
-                text="No results found.",
-                font=("Arial", 14)
-            ).pack(pady=20)
-            return
-
-        for f in results:
-            self.add_file_card(f)
+        self.query = self.search_entry.get().lower().strip()
+        self.render_list()
 
     # -------------------------------------------------
     # Preview & Download
     # -------------------------------------------------
-    def preview_file(self, filename: str):
+    def preview_file(self, key: str):
+        # The URL (presigned if there's no CloudFront) is only built when a file is opened
         try:
             # Use CloudFront if configured
             if CLOUDFRONT_DOMAIN:
-                url = f"https://{CLOUDFRONT_DOMAIN}/{filename}"
+                url = f"https://{CLOUDFRONT_DOMAIN}/{key}"
             else:
-                mime = guess_mime_type(filename)
-                params = {"Bucket": BUCKET_NAME, "Key": filename}
+                mime = guess_mime_type(key)
+                params = {"Bucket": BUCKET_NAME, "Key": key}
                 if mime:
                     params["ResponseContentType"] = mime
                     params["ResponseContentDisposition"] = "inline"
@@ -332,13 +269,14 @@ class StudentDashboard(ctk.CTk):
         except Exception as e:
             messagebox.showerror("Preview Error", f"Cannot open file in browser.\n{e}")
 
-    def download_file(self, filename: str):
+    def download_file(self, key: str):
         try:
             downloads_dir = os.path.join(os.path.expanduser("~"), "Downloads")
             os.makedirs(downloads_dir, exist_ok=True)
-            dest_path = os.path.join(downloads_dir, filename)
+            # Web uploads are keyed materials/<uuid>/<name>; save as just <name>
+            dest_path = os.path.join(downloads_dir, os.path.basename(key))
 
-            s3.download_file(BUCKET_NAME, filename, dest_path)
+            s3.download_file(BUCKET_NAME, key, dest_path, Config=TRANSFER_CONFIG)
             messagebox.showinfo("Downloaded", f"File saved to:\n{dest_path}")
         except Exception as e:
             messagebox.showerror("Download Error", f"Failed to download file.\n{e}")
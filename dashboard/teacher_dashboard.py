@@ -3,55 +3,27 @@ from tkinter import filedialog, messagebox
 import os
 import json
 import datetime
-import boto3
 import threading
 from dotenv import load_dotenv
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 
+from dashboard.virtual_list import VirtualList
+from utils.ai_tags import generate_ai_tags
+from utils.catalogue_cache import get_catalogue
+from utils.s3_helper import get_s3_client, TRANSFER_CONFIG
+
 # -------------------------------------------------
 # Load ENV
 # -------------------------------------------------
 load_dotenv()
 
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 BUCKET_NAME = os.getenv("S3_BUCKET")
-REGION = os.getenv("AWS_DEFAULT_REGION")
 CLOUDFRONT_DOMAIN = os.getenv("CLOUDFRONT_DOMAIN")  # e.g. dbci5xyzb8tw6.cloudfront.net
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 UPLOADS_JSON = os.path.join(BASE_DIR, "uploads.json")
 
-
-# -------------------------------------------------
-# AI TAG GENERATOR
-# -------------------------------------------------
-def generate_ai_tags(file_name):
-    name = file_name.lower()
-    tags = set()
-
-    if "python" in name:
-        tags.update(["Python", "Programming"])
-    if "c " in name or name.startswith("c_") or " c" in name:
-        tags.update(["C Language", "Coding"])
-    if "dsa" in name or "data" in name:
-        tags.update(["Data Structures", "Algorithms"])
-    if "sql" in name or "db" in name:
-        tags.update(["SQL", "Database"])
-    if "ai" in name or "ml" in name:
-        tags.update(["AI", "Machine Learning"])
-    if "cloud" in name:
-        tags.update(["Cloud", "AWS"])
-    if "network" in name:
-        tags.update(["Networking"])
-    if "java" in name:
-        tags.update(["Java", "OOP"])
-    if "os" in name:
-        tags.update(["Operating System"])
-    if not tags:
-        tags.update(["General Study Material"])
-
-    return list(tags)
+UPLOAD_CARD_HEIGHT = 140    # px per row in "View Uploads"
 
 
 # -------------------------------------------------
@@ -87,14 +59,9 @@ class TeacherDashboard(ctk.CTk):
         self.geometry("1100x700")
         self.minsize(1000, 650)
 
-        # Initialize S3 Client
+        # Initialize S3 Client (shared, pooled)
         try:
-            self.s3 = boto3.client(
-                "s3",
-                aws_access_key_id=AWS_ACCESS_KEY,
-                aws_secret_access_key=AWS_SECRET_KEY,
-                region_name=REGION
-            )
+            self.s3 = get_s3_client()
         except Exception as e:
             messagebox.showerror("AWS Error", f"Failed to connect to AWS:\n{e}")
             self.s3 = None
@@ -284,12 +251,14 @@ class TeacherDashboard(ctk.CTk):
                     self.s3.upload_fileobj(
                         f, BUCKET_NAME, filename,
                         ExtraArgs=extra_args,
-                        Callback=progress_callback
+                        Callback=progress_callback,
+                        Config=TRANSFER_CONFIG
                     )
                 else:
                     self.s3.upload_fileobj(
                         f, BUCKET_NAME, filename,
-                        Callback=progress_callback
+                        Callback=progress_callback,
+                        Config=TRANSFER_CONFIG
                     )
 
             # Build URL for saving into uploads.json (for Admin / Teacher view)
@@ -361,7 +330,10 @@ class TeacherDashboard(ctk.CTk):
     # VIEW UPLOADS
     # -------------------------------------------------
     def view_uploads(self):
-        uploads = self.load_uploads()
+        # uploads.json is only re-read when it changed since the last import
+        catalogue = get_catalogue()
+        catalogue.sync_uploads_json(UPLOADS_JSON)
+        uploads = catalogue.recorded_uploads()   # (filename, url, uploaded_on, tags), newest first
         if not uploads:
             messagebox.showinfo("Uploads", "No uploads recorded yet.")
             return
@@ -377,46 +349,51 @@ class TeacherDashboard(ctk.CTk):
         )
         header.pack(pady=(10, 8))
 
-        scroll = ctk.CTkScrollableFrame(win)
-        scroll.pack(expand=True, fill="both", padx=12, pady=8)
-
-        for f in reversed(uploads):
-            card = ctk.CTkFrame(scroll, corner_radius=8)
-            card.pack(fill="x", padx=8, pady=8)
-
-            ctk.CTkLabel(
-                card,
-                text=f"{f['filename']}",
-                anchor="w",
-                font=ctk.CTkFont(size=13, weight="bold")
-            ).pack(fill="x", padx=12, pady=(8, 2))
-
-            ctk.CTkLabel(
-                card,
-                text=f"Uploaded: {f['uploaded_on']} · Tags: {', '.join(f.get('tags', []))}",
-                anchor="w",
-                font=ctk.CTkFont(size=11)
-            ).pack(fill="x", padx=12, pady=(0, 6))
-
-            ctk.CTkLabel(
-                card,
-                text=f"URL: {f.get('url', '')}",
-                anchor="w",
-                font=ctk.CTkFont(size=10)
-            ).pack(fill="x", padx=12, pady=(0, 4))
-
-            button_row = ctk.CTkFrame(card)
-            button_row.pack(padx=12, pady=(0, 10), anchor="e")
-
-            ctk.CTkButton(
-                button_row, text="Open", width=80,
-                command=lambda url=f["url"]: self.open_url(url)
-            ).pack(side="right", padx=4)
-
-            ctk.CTkButton(
-                button_row, text="Copy URL", width=90,
-                command=lambda url=f["url"]: self.copy_to_clipboard(url)
-            ).pack(side="right", padx=4)
+        # Only the cards on screen exist; they are re-filled as the list scrolls
+        upload_list = VirtualList(win, UPLOAD_CARD_HEIGHT, self.make_upload_card, self.fill_upload_card)
+        upload_list.pack(expand=True, fill="both", padx=12, pady=8)
+        upload_list.set_rows(uploads)
+
+    def make_upload_card(self, parent) -> dict:
+        frame = ctk.CTkFrame(parent, corner_radius=8)
+        frame.pack(fill="both", expand=True, padx=8, pady=4)
+
+        card = {"row": None}
+        card["name"] = ctk.CTkLabel(
+            frame,
+            text="",
+            anchor="w",
+            font=ctk.CTkFont(size=13, weight="bold")
+        )
+        card["name"].pack(fill="x", padx=12, pady=(8, 2))
+
+        card["info"] = ctk.CTkLabel(frame, text="", anchor="w", font=ctk.CTkFont(size=11))
+        card["info"].pack(fill="x", padx=12, pady=(0, 6))
+
+        card["url"] = ctk.CTkLabel(frame, text="", anchor="w", font=ctk.CTkFont(size=10))
+        card["url"].pack(fill="x", padx=12, pady=(0, 4))
+
+        button_row = ctk.CTkFrame(frame)
+        button_row.pack(padx=12, pady=(0, 10), anchor="e")
+
+        # The buttons act on whichever upload the card is showing at the time
+        ctk.CTkButton(
+            button_row, text="Open", width=80,
+            command=lambda: self.open_url(card["row"][1])
+        ).pack(side="right", padx=4)
+
+        ctk.CTkButton(
+            button_row, text="Copy URL", width=90,
+            command=lambda: self.copy_to_clipboard(card["row"][1])
+        ).pack(side="right", padx=4)
+        return card
+
+    def fill_upload_card(self, card: dict, row: tuple):
+        filename, url, uploaded_on, tags = row
+        card["row"] = row
+        card["name"].configure(text=os.path.basename(filename))   # keys may carry a materials/<uuid>/ prefix
+        card["info"].configure(text=f"Uploaded: {uploaded_on} · Tags: {tags}")
+        card["url"].configure(text=f"URL: {url}")
 
     def open_url(self, url: str):
         import webbrowser
@@ -0,0 +1,146 @@
+import tkinter
+
+import customtkinter as ctk
+
+# -------------------------------------------------
+# VIRTUALIZED LIST
+# -------------------------------------------------
+# A scrollable list that only builds widgets for the rows on screen plus a
+# few above/below. Row data stays in a plain list of tuples; scrolling
+# re-fills the existing row widgets instead of creating new ones, so
+# thousands of files cost a screenful of widgets, not a card each.
+
+WHEEL_STEP = 60     # pixels per mouse-wheel notch
+WHEEL_EVENTS = ("<MouseWheel>", "<Button-4>", "<Button-5>")
+
+
+class VirtualList(ctk.CTkFrame):
+    """
+    make_row(parent) builds the widgets of one empty row inside `parent` (a
+    fixed-height frame) and returns a handle to them; fill_row(handle, row)
+    shows a data row in it (and is the place to point its buttons at that
+    row). Every row is `row_height` pixels tall.
+    """
+
+    def __init__(self, master, row_height: int, make_row, fill_row, buffer: int = 3,
+                 empty_text: str = "", **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_height = row_height
+        self.make_row = make_row
+        self.fill_row = fill_row
+        self.buffer = buffer
+
+        self._rows = []         # the row store: one tuple per item
+        self._top = 0           # scroll offset in pixels
+        self._pool = []         # recycled rows: (frame, handle from make_row)
+        self._bound = []        # index of the row each pool entry currently shows
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.empty_label = ctk.CTkLabel(self.viewport, text=empty_text, font=("Arial", 14))
+
+        self.viewport.bind("<Configure>", lambda e: self._layout())
+        # Wheel events go to the widget under the cursor, so every widget of the list
+        # gets the binding (not bind_all: that would outlive the list)
+        self._bind_wheel(self)
+
+    # -------------------------------------------------
+    # Data
+    # -------------------------------------------------
+    def set_rows(self, rows, empty_text: str | None = None, keep_scroll: bool = False):
+        """Show `rows` (a list of tuples), from the top unless keep_scroll."""
+        self._rows = rows
+        if not keep_scroll:
+            self._top = 0
+        self._bound = [None] * len(self._pool)
+        if empty_text is not None:
+            self.empty_label.configure(text=empty_text)
+        self._layout()
+
+    def __len__(self):
+        return len(self._rows)
+
+    # -------------------------------------------------
+    # Scrolling
+    # -------------------------------------------------
+    def _max_top(self) -> int:
+        return max(len(self._rows) * self.row_height - self.viewport.winfo_height(), 0)
+
+    def scroll_to(self, top: float):
+        self._top = int(min(max(top, 0), self._max_top()))
+        self._layout()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self._rows) * self.row_height)
+        elif action == "scroll":
+            step = self.viewport.winfo_height() if unit == "pages" else self.row_height
+            self.scroll_to(self._top + int(value) * step)
+
+    def _bind_wheel(self, widget):
+        """Scroll on wheel events over `widget` and everything inside it."""
+        for seq in WHEEL_EVENTS:
+            # tkinter's bind: CTk widgets' bind() only reaches their canvas
+            tkinter.Misc.bind(widget, seq, self._on_wheel, add="+")
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            direction = -1
+        elif event.num == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self.scroll_to(self._top + direction * WHEEL_STEP)
+
+    # -------------------------------------------------
+    # Layout
+    # -------------------------------------------------
+    def _layout(self):
+        height = self.viewport.winfo_height()
+        total = len(self._rows)
+        self._top = min(self._top, self._max_top())
+
+        if not total:
+            for frame, _ in self._pool:
+                frame.place_forget()
+            if self.empty_label.cget("text"):
+                self.empty_label.place(relx=0.5, y=20, anchor="n")
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.place_forget()
+
+        # Widgets needed: the rows on screen plus `buffer` either side
+        visible = height // self.row_height + 2
+        size = visible + 2 * self.buffer
+        while len(self._pool) < size:
+            # CTk widgets take their size in the constructor, not in place()
+            frame = ctk.CTkFrame(self.viewport, height=self.row_height, fg_color="transparent")
+            frame.pack_propagate(False)
+            self._pool.append((frame, self.make_row(frame)))
+            self._bind_wheel(frame)
+            self._bound.append(None)
+
+        first = self._top // self.row_height
+        start = max(first - self.buffer, 0)
+        end = min(first + visible + self.buffer, total)
+        shown = set()
+        for idx in range(start, end):
+            # Row idx always lands in the same pool slot, so a small scroll re-fills only a few
+            slot = idx % len(self._pool)
+            frame, handle = self._pool[slot]
+            if self._bound[slot] != idx:
+                self.fill_row(handle, self._rows[idx])
+                self._bound[slot] = idx
+            frame.place(x=0, y=idx * self.row_height - self._top, relwidth=1.0)
+            shown.add(slot)
+        for slot, (frame, _) in enumerate(self._pool):
+            if slot not in shown:
+                frame.place_forget()
+
+        span = total * self.row_height
+        self.scrollbar.set(self._top / span, min((self._top + height) / span, 1.0))
@@ -0,0 +1,125 @@
+# import_users.py
+# Bulk-create accounts from a CSV (e.g. a whole class at semester start):
+#
+#   python import_users.py students.csv                 # username,password[,role]
+#   python import_users.py staff.csv --role Teacher     # role for rows without one
+#   python import_users.py big.csv --scrypt-n 4096      # cheaper hashes, upgraded at first login
+#
+# Passwords are hashed in parallel (same scheme as /signup), then each chunk
+# is loaded with COPY into a temp table and inserted in one statement;
+# usernames that already exist are skipped, not overwritten.
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from auth.auth_backend import ROLES
+from auth.passwords import ScryptHasher, hash_password
+from db import db_cursor, init_db
+
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "5000"))   # rows per COPY
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+
+
+def read_rows(f, default_role: str):
+    """Yield (line_no, username, password, role); a header row is skipped."""
+    for line_no, rec in enumerate(csv.reader(f), start=1):
+        if not rec or (line_no == 1 and [c.strip().lower() for c in rec[:2]] == ["username", "password"]):
+            continue
+        username = rec[0].strip()
+        password = rec[1] if len(rec) > 1 else ""
+        role = (rec[2].strip() if len(rec) > 2 else "") or default_role
+        yield line_no, username, password, role
+
+
+def chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def existing_usernames(usernames) -> set:
+    with db_cursor() as cur:
+        cur.execute("SELECT username FROM users WHERE username = ANY(%s);", (list(usernames),))
+        return {row[0] for row in cur.fetchall()}
+
+
+def copy_users(rows) -> int:
+    """COPY (username, password_hash, role) rows in; returns how many were new."""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    with db_cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE users_import (username TEXT, password_hash TEXT, role TEXT)
+            ON COMMIT DROP;
+        """)
+        cur.copy_expert("COPY users_import (username, password_hash, role) FROM STDIN WITH (FORMAT csv)", buf)
+        cur.execute("""
+            INSERT INTO users (username, password_hash, role)
+            SELECT DISTINCT ON (username) username, password_hash, role FROM users_import
+            ON CONFLICT (username) DO NOTHING;
+        """)
+        return cur.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import users from a CSV file.")
+    parser.add_argument("csv_file", help='CSV with username,password[,role] ("-" for stdin)')
+    parser.add_argument("--role", default="Student", choices=ROLES, help="role for rows without one")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="password hashing threads")
+    parser.add_argument("--scrypt-n", type=int, help="scrypt cost for imported hashes (default: the app's "
+                        "setting); lower imports faster and each user's first login re-hashes at full cost")
+    args = parser.parse_args(argv)
+    hasher = ScryptHasher(n=args.scrypt_n) if args.scrypt_n else None
+
+    init_db()
+    started = time.perf_counter()
+    total = created = 0
+    invalid = []
+    hash_time = db_time = 0.0
+
+    f = sys.stdin if args.csv_file == "-" else open(args.csv_file, newline="", encoding="utf-8-sig")
+    with f, ThreadPoolExecutor(max(args.workers, 1)) as pool:
+        for chunk in chunks(read_rows(f, args.role), IMPORT_CHUNK):
+            valid = []
+            for line_no, username, password, role in chunk:
+                if username and password and role in ROLES:
+                    valid.append((username, password, role))
+                else:
+                    invalid.append(line_no)
+            # Don't spend hashing time on accounts that are already there
+            existing = existing_usernames({username for username, _, _ in valid})
+            valid = [row for row in valid if row[0] not in existing]
+
+            t0 = time.perf_counter()
+            hashes = pool.map(partial(hash_password, hasher=hasher), [password for _, password, _ in valid])
+            rows = [(username, pwd_hash, role) for (username, _, role), pwd_hash in zip(valid, hashes)]
+            t1 = time.perf_counter()
+            if rows:
+                created += copy_users(rows)
+            hash_time += t1 - t0
+            db_time += time.perf_counter() - t1
+            total += len(chunk)
+            print(f"  {total} rows read, {created} users created")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{created} created, {total - created - len(invalid)} already existed, "
+          f"{len(invalid)} invalid, {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s; "
+          f"hashing {hash_time:.1f}s, COPY + insert {db_time:.2f}s)")
+    if invalid:
+        print(f"Invalid lines (need username, password and a role in {', '.join(ROLES)}): "
+              f"{invalid[:50]}{' ...' if len(invalid) > 50 else ''}")
+
+
+if __name__ == "__main__":
+    main()
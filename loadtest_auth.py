@@ -0,0 +1,82 @@
+# loadtest_auth.py
+# Signup/login throughput against a running app:
+#
+#   gunicorn app:app ... &        (or python app.py)
+#   python loadtest_auth.py --url http://127.0.0.1:5000 --users 500 --concurrency 32
+#
+# Phase 1 signs up `--users` fresh accounts, phase 2 logs each of them in,
+# both from `--concurrency` threads. Reports requests/s, latency percentiles
+# and how many requests were shed with 503 (password pool full).
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+def run_phase(name: str, fn, items, concurrency: int):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(item):
+        if not hasattr(local, "http"):
+            local.http = requests.Session()
+        started = time.perf_counter()
+        try:
+            status = fn(local.http, item)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, items))
+    wall = time.perf_counter() - started
+
+    print(f"{name:<7} {len(items)} requests in {wall:.1f}s = {len(items) / wall:.1f} req/s | "
+          f"p50 {percentile(latencies, 50) * 1000:.0f}ms  p95 {percentile(latencies, 95) * 1000:.0f}ms  "
+          f"p99 {percentile(latencies, 99) * 1000:.0f}ms | {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /signup and /login.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--role", default="Student")
+    args = parser.parse_args()
+
+    prefix = f"load-{uuid.uuid4().hex[:8]}"
+    users = [(f"{prefix}-{i}", f"pw-{i}-{prefix}") for i in range(args.users)]
+
+    # A successful signup/login answers with a redirect; failures re-render the form (200) or 503
+    def signup(http, user):
+        r = http.post(f"{args.url}/signup", allow_redirects=False,
+                      data={"username": user[0], "password": user[1], "role": args.role})
+        return "ok" if r.status_code == 302 else r.status_code
+
+    def login(http, user):
+        r = http.post(f"{args.url}/login", allow_redirects=False,
+                      data={"username": user[0], "password": user[1]})
+        return "ok" if r.status_code == 302 and r.headers.get("Location", "").endswith("/dashboard") else r.status_code
+
+    print(f"{args.users} users, {args.concurrency} concurrent clients -> {args.url}\n")
+    run_phase("signup", signup, users, args.concurrency)
+    run_phase("login", login, users, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import chatbot_backend
+
+
+class FakeQuestionIndex:
+    def __init__(self, answer=None):
+        self.answer = answer
+
+    def lookup(self, question, threshold):
+        return self.answer
+
+
+class BrokenQuestionIndex:
+    def lookup(self, question, threshold):
+        raise ConnectionError("database unreachable")
+
+
+@pytest.fixture
+def logged(app_module, monkeypatch):
+    """AI log entries queued by the routes, as (question, answer, username)."""
+    entries = []
+    monkeypatch.setattr(app_module, "queue_ai_log", lambda q, a, u: entries.append((q, a, u)))
+    monkeypatch.setattr(app_module, "get_question_index", lambda: FakeQuestionIndex())
+    return entries
+
+
+def parse_events(body: str):
+    """[(event name, data dict)] from an SSE body."""
+    events = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        name, data = "message", None
+        for line in block.split("\n"):
+            field, _, value = line.partition(": ")
+            if field == "event":
+                name = value
+            elif field == "data":
+                data = json.loads(value)
+        events.append((name, data))
+    return events
+
+
+def test_stream_sends_chunks_then_done(client_as, logged):
+    client = client_as("s1", "Student")
+    r = client.post("/api/chat/stream", json={"message": "what is a binary heap"})
+
+    assert r.status_code == 200
+    assert r.mimetype == "text/event-stream"
+    assert r.headers["Cache-Control"] == "no-cache"
+
+    events = parse_events(r.get_data(as_text=True))
+    assert events[-1] == ("done", {})
+    chunks = [data["text"] for name, data in events[:-1]]
+    assert all(name == "message" for name, _ in events[:-1])
+    assert len(chunks) > 1                       # streamed, not sent in one piece
+    answer = "".join(chunks).strip()
+    assert answer == "(offline) You asked: what is a binary heap"
+    assert logged == [("what is a binary heap", answer, "s1")]
+
+
+def test_index_hit_is_one_chunk(app_module, client_as, logged, monkeypatch):
+    monkeypatch.setattr(app_module, "get_question_index", lambda: FakeQuestionIndex("stored answer"))
+    client = client_as("s1", "Student")
+    events = parse_events(client.post("/api/chat/stream", json={"message": "explain heaps"}).get_data(as_text=True))
+
+    assert events == [("message", {"text": "stored answer"}), ("done", {})]
+    assert logged == [("explain heaps", "stored answer", "s1")]
+
+
+@pytest.mark.parametrize("url", ["/api/chat", "/api/chat/stream"])
+def test_index_error_falls_back_to_the_model(app_module, client_as, logged, monkeypatch, url):
+    monkeypatch.setattr(app_module, "get_question_index", lambda: BrokenQuestionIndex())
+    r = client_as("s1", "Student").post(url, json={"message": "explain heaps"})
+    r.get_data()                                 # the stream logs once it has been sent
+
+    assert r.status_code == 200
+    assert logged == [("explain heaps", "(offline) You asked: explain heaps", "s1")]
+
+
+def test_disconnect_mid_stream_is_not_logged(client_as, logged):
+    client = client_as("s1", "Student")
+    r = client.post("/api/chat/stream", json={"message": "tell me about graphs and trees"}, buffered=False)
+    chunks = iter(r.response)
+    assert next(chunks).startswith(b"data: ")
+    r.close()                                    # client goes away before `done`
+
+    assert logged == []
+
+
+def test_error_mid_stream_logs_only_the_error(client_as, logged, monkeypatch):
+    def broken_stream(question):
+        yield "partial "
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(chatbot_backend.client, "stream", broken_stream)
+    client = client_as("s1", "Student")
+    events = parse_events(client.post("/api/chat/stream", json={"message": "explain tcp handshakes"})
+                          .get_data(as_text=True))
+
+    assert events[0] == ("message", {"text": "partial "})
+    assert events[1][1]["text"].startswith("AI Error:")
+    assert events[-1] == ("done", {})
+    # The partial answer must not be stored (and so never reused by the question index)
+    assert [a for _, a, _ in logged] == [events[1][1]["text"]]
+
+
+def test_stream_requires_login(app_module, logged):
+    r = app_module.app.test_client().post("/api/chat/stream", json={"message": "hi"})
+    assert r.status_code == 302
+    assert logged == []
@@ -0,0 +1,57 @@
+import pytest
+
+import utils.content_search as content_search
+from db import db_cursor
+from utils.pagination import decode_rank_cursor
+
+PREFIX = "test-content-search-"
+
+
+@pytest.fixture
+def identical_docs(database):
+    """Eight ready uploads whose two pages all rank the same for "heap"."""
+    with db_cursor() as cur:
+        for i in range(8):
+            content_hash = f"{PREFIX}{i}"
+            for page in range(2):
+                cur.execute("INSERT INTO pdf_pages (content_hash, page_no, text) VALUES (%s, %s, %s);",
+                            (content_hash, page, "Inserting into a binary heap"))
+            cur.execute("""
+                INSERT INTO uploads (uploaded_by, filename, url, content_hash, status, s3_key)
+                VALUES ('t1', %s, 'https://cdn.example.test/x', %s, 'ready', %s);
+            """, (f"doc{i}.pdf", content_hash, f"materials/{i}/doc{i}.pdf"))
+    yield
+    with db_cursor() as cur:
+        cur.execute("DELETE FROM uploads WHERE content_hash LIKE %s;", (PREFIX + "%",))
+        cur.execute("DELETE FROM pdf_pages WHERE content_hash LIKE %s;", (PREFIX + "%",))
+
+
+def search_all(query, limit):
+    """Every result, following next_cursor page by page."""
+    rows, cursor = [], None
+    while True:
+        page, next_cursor = content_search.search_contents(query, limit, cursor)
+        rows += [r["filename"] for r in page]
+        if next_cursor is None:
+            return rows
+        cursor = decode_rank_cursor(next_cursor)
+
+
+def test_more_matches_than_the_cap_rank_the_same_every_time(identical_docs, monkeypatch):
+    # 16 tied pages, 5 kept: (content_hash, page_no) decides which, every time
+    monkeypatch.setattr(content_search, "SEARCH_MAX_PAGES", 5)
+
+    rows, next_cursor = content_search.search_contents("heap", 20)
+
+    assert next_cursor is None
+    assert [r["filename"] for r in rows] == ["doc1.pdf", "doc0.pdf", "doc2.pdf"]
+    assert rows[0]["pages"] == [0, 1] and rows[2]["pages"] == [0]
+    for _ in range(3):
+        assert search_all("heap", 1) == ["doc1.pdf", "doc0.pdf", "doc2.pdf"]
+
+
+def test_keyset_pages_cover_every_result_once(identical_docs):
+    everything = [r["filename"] for r in content_search.search_contents("heap", 20)[0]]
+
+    assert len(everything) == 8
+    assert search_all("heap", 3) == everything
@@ -0,0 +1,85 @@
+import pytest
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def teacher(app_module, s3, client_as, monkeypatch):
+    monkeypatch.setattr(app_module.pipeline, "find_duplicate", lambda h, **kwargs: None)
+    monkeypatch.setattr(app_module, "db_find_upload_by_key", lambda key, username: None)
+    return client_as("t1", "Teacher")
+
+
+def start_multipart(client, size=12 * MB):
+    r = client.post("/api/uploads/direct/start", json={"filename": "big.pdf", "size": size})
+    assert r.status_code == 200 and r.json["mode"] == "multipart"
+    return r.json
+
+
+def test_parts_presigns_requested_numbers(teacher):
+    start = start_multipart(teacher)
+    assert start["part_count"] == 3
+
+    r = teacher.post("/api/uploads/direct/parts", json={"token": start["token"], "part_numbers": [1, 3]})
+
+    assert r.status_code == 200
+    assert sorted(r.json["urls"]) == ["1", "3"]
+    assert "partNumber=3" in r.json["urls"]["3"]
+
+
+@pytest.mark.parametrize("numbers", [
+    ["x"], [None], [1.5], [True], [0], [4],   # not an int, or outside 1..part_count
+    [], "1,2", None, list(range(1, 102)),     # not a list, empty or too many
+])
+def test_parts_rejects_bad_part_numbers(teacher, numbers):
+    start = start_multipart(teacher)
+    r = teacher.post("/api/uploads/direct/parts", json={"token": start["token"], "part_numbers": numbers})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("parts", [
+    None, [], [{"PartNumber": "one", "ETag": "x"}], [{"PartNumber": 9, "ETag": "x"}], [{"PartNumber": 1}], ["1"],
+])
+def test_complete_rejects_bad_part_lists(teacher, parts):
+    start = start_multipart(teacher)
+    r = teacher.post("/api/uploads/direct/complete", json={"token": start["token"], "parts": parts})
+    assert r.status_code == 400
+    assert r.json["error"] == "Invalid part list."
+
+
+def test_parts_requires_a_valid_token(teacher):
+    r = teacher.post("/api/uploads/direct/parts", json={"token": "forged", "part_numbers": [1]})
+    assert r.status_code == 400
+
+
+def put_object(s3, key, size):
+    s3.put_object(Bucket="test-bucket", Key=key, Body=b"x" * size)
+
+
+def test_complete_rejects_a_size_other_than_claimed(app_module, s3, teacher, monkeypatch):
+    monkeypatch.setattr(app_module, "db_add_upload", lambda row: pytest.fail("recorded"))
+    r = teacher.post("/api/uploads/direct/start", json={"filename": "notes.pdf", "size": 1000})
+    assert r.json["mode"] == "post"
+    claims = app_module.upload_tokens.loads(r.json["token"])
+    put_object(s3, claims["key"], 5000)
+
+    r = teacher.post("/api/uploads/direct/complete", json={"token": r.json["token"]})
+
+    assert r.status_code == 400
+    assert "Contents" not in s3.list_objects_v2(Bucket="test-bucket")    # the object is removed
+
+
+def test_start_reuses_only_the_teachers_own_uploads(app_module, teacher, monkeypatch):
+    asked = []
+    dup = {"id": 7, "url": "https://cdn.example.test/old", "size_bytes": 1000}
+    monkeypatch.setattr(app_module.pipeline, "find_duplicate",
+                        lambda h, uploaded_by=None: asked.append(uploaded_by) or dup)
+    monkeypatch.setattr(app_module, "add_duplicate_upload", lambda dup, filename, h: 99)
+    body = {"filename": "notes.pdf", "size": 1000, "sha256": "ab" * 32}
+
+    assert teacher.post("/api/uploads/direct/start", json=body).json["mode"] == "existing"
+    assert asked == ["t1"]
+
+    # Same claimed hash, different size: uploaded normally
+    body["size"] = 2000
+    assert teacher.post("/api/uploads/direct/start", json=body).json["mode"] == "post"
@@ -0,0 +1,75 @@
+import threading
+
+from utils.job_queue import MemoryJobQueue, WorkerPool
+
+
+def run_pool(job_queue, handlers, on_failure=None, until=None, timeout=5.0):
+    pool = WorkerPool(job_queue, handlers, size=1, on_failure=on_failure, poll_interval=0.05)
+    pool.start()
+    try:
+        assert until.wait(timeout), "job did not finish"
+    finally:
+        pool.stop()
+
+
+def test_failed_job_is_retried_until_it_succeeds():
+    q = MemoryJobQueue(max_attempts=3, retry_delay=0.01)
+    attempts = []
+    done = threading.Event()
+
+    def handler(payload):
+        attempts.append(payload["n"])
+        if len(attempts) < 3:
+            raise RuntimeError("flaky")
+        done.set()
+
+    q.enqueue("work", {"n": 1})
+    run_pool(q, {"work": handler}, until=done)
+
+    assert attempts == [1, 1, 1]
+    assert q.failed == []
+    assert q.pending() == 0
+
+
+def test_job_gives_up_after_max_attempts():
+    q = MemoryJobQueue(max_attempts=2, retry_delay=0.01)
+    failures = []
+    gave_up = threading.Event()
+
+    def handler(payload):
+        raise ValueError("bad file")
+
+    def on_failure(payload, error):
+        failures.append((payload, error))
+        gave_up.set()
+
+    q.enqueue("work", {"upload_id": 7})
+    run_pool(q, {"work": handler}, on_failure={"work": on_failure}, until=gave_up)
+
+    assert failures == [({"upload_id": 7}, "ValueError: bad file")]
+    assert len(q.failed) == 1
+    job, error = q.failed[0]
+    assert job["attempts"] == 2
+    assert error == "ValueError: bad file"
+
+
+def test_fail_requeues_with_backoff():
+    q = MemoryJobQueue(max_attempts=3, retry_delay=0.05)
+    q.enqueue("work", {})
+    job = q.claim(timeout=0.1)
+
+    assert q.fail(job, "boom") is False
+    assert q.claim(timeout=0.01) is None            # not back before the delay
+    again = q.claim(timeout=1.0)
+    assert again["id"] == job["id"]
+    assert again["attempts"] == 2
+
+
+def test_unknown_kind_counts_as_a_failure():
+    q = MemoryJobQueue(max_attempts=1, retry_delay=0.01)
+    q.enqueue("nope", {})
+    pool = WorkerPool(q, {})
+    pool.run_job(q.claim(timeout=0.1))
+
+    assert len(q.failed) == 1
+    assert q.failed[0][1].startswith("KeyError")
@@ -0,0 +1,150 @@
+import hashlib
+import io
+
+import pytest
+
+from utils.storage_utils import S3_BUCKET, upload_stream
+from utils.upload_stream import HashingReader, MultipartFileStream
+
+MB = 1024 * 1024
+BOUNDARY = b"----learnxtestboundary"
+
+
+def multipart_body(data: bytes, filename="notes.pdf", field="file", before=b"") -> bytes:
+    """A multipart/form-data body with an optional text field ahead of the file."""
+    body = b""
+    if before:
+        body += (b"--" + BOUNDARY + b"\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\n"
+                 + before + b"\r\n")
+    body += (b"--" + BOUNDARY + b"\r\n"
+             + f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'.encode()
+             + b"Content-Type: application/pdf\r\n\r\n"
+             + data + b"\r\n--" + BOUNDARY + b"--\r\n")
+    return body
+
+
+def payload(size: int) -> bytes:
+    # Not a repeating pattern, so a dropped or duplicated chunk changes the hash
+    return b"".join(hashlib.sha256(str(i).encode()).digest() for i in range(size // 32 + 1))[:size]
+
+
+# -------------------------------------------------
+# MultipartFileStream / HashingReader
+# -------------------------------------------------
+def test_multipart_stream_reads_the_file_field_across_small_chunks():
+    data = payload(200_000)
+    part = MultipartFileStream(io.BytesIO(multipart_body(data, before=b"Week 3")), BOUNDARY,
+                               chunk_size=1000).open()
+
+    assert part.filename == "notes.pdf"
+    assert part.content_type == "application/pdf"
+    assert part.read() == data
+
+
+def test_multipart_stream_without_the_field_raises():
+    body = multipart_body(b"abc", field="attachment")
+    with pytest.raises(ValueError):
+        MultipartFileStream(io.BytesIO(body), BOUNDARY).open()
+
+
+def test_multipart_stream_truncated_body_raises():
+    body = multipart_body(payload(10_000))[:5_000]
+    part = MultipartFileStream(io.BytesIO(body), BOUNDARY, chunk_size=1000).open()
+    with pytest.raises(ValueError):
+        part.read()
+
+
+def test_hashing_reader_hashes_and_counts():
+    data = payload(300_000)
+    reader = HashingReader(io.BytesIO(data))
+
+    assert reader.read(123_456) == data[:123_456]
+    assert reader.read() == data[123_456:]
+    assert reader.size == len(data)
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_hashing_reader_fills_each_read():
+    # The multipart stream returns short reads; s3transfer would take one as end-of-file
+    data = payload(300_000)
+    part = MultipartFileStream(io.BytesIO(multipart_body(data)), BOUNDARY, chunk_size=777).open()
+    reader = HashingReader(part)
+
+    assert len(reader.read(100_000)) == 100_000
+    assert len(reader.read(100_000)) == 100_000
+
+
+# -------------------------------------------------
+# upload_stream against S3 (moto)
+# -------------------------------------------------
+@pytest.mark.parametrize("size, multipart", [(100_000, False), (11 * MB, True)])
+def test_upload_stream_round_trip(s3, size, multipart):
+    data = payload(size)
+    part = MultipartFileStream(io.BytesIO(multipart_body(data)), BOUNDARY).open()
+    reader = HashingReader(part)
+
+    url = upload_stream(reader, "materials/x/notes.pdf", content_type=part.content_type)
+
+    assert url == "https://cdn.example.test/materials/x/notes.pdf"
+    obj = s3.get_object(Bucket=S3_BUCKET, Key="materials/x/notes.pdf")
+    assert obj["Body"].read() == data
+    assert obj["ContentType"] == "application/pdf"
+    # Multipart ETags are "<md5 of part md5s>-<part count>"
+    assert ("-" in obj["ETag"]) is multipart
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+# -------------------------------------------------
+# upload_page duplicate handling
+# -------------------------------------------------
+@pytest.fixture
+def upload_app(app_module, monkeypatch):
+    """upload_page with the DB calls recorded; find_duplicate answers from `known`."""
+    calls = {"added": [], "duplicates": [], "jobs": [], "known": {}}
+    monkeypatch.setattr(app_module.pipeline, "find_duplicate", lambda h, exclude_id=None: calls["known"].get(h))
+    monkeypatch.setattr(app_module, "db_add_upload", lambda row: calls["added"].append(row) or len(calls["added"]))
+    monkeypatch.setattr(app_module, "add_duplicate_upload",
+                        lambda dup, filename, h: calls["duplicates"].append((dup, filename, h)) or 99)
+
+    class Queue:
+        def enqueue(self, kind, payload):
+            calls["jobs"].append((kind, payload))
+
+    monkeypatch.setattr(app_module, "get_job_queue", lambda: Queue())
+    return calls
+
+
+def post_file(client, data: bytes, filename="notes.txt"):
+    return client.post("/upload", data=multipart_body(data, filename=filename),
+                       content_type=f"multipart/form-data; boundary={BOUNDARY.decode()}")
+
+
+def bucket_keys(s3):
+    return [o["Key"] for o in s3.list_objects_v2(Bucket=S3_BUCKET).get("Contents", [])]
+
+
+@pytest.mark.parametrize("filename", ["notes.txt", "notes.pdf"])
+def test_upload_page_stores_a_new_file(s3, client_as, upload_app, filename):
+    data = payload(50_000)
+    r = post_file(client_as("t1", "Teacher"), data, filename=filename)
+
+    assert r.status_code == 200
+    [row] = upload_app["added"]
+    assert row["content_hash"] == hashlib.sha256(data).hexdigest()
+    assert row["size_bytes"] == len(data)
+    assert bucket_keys(s3) == [row["s3_key"]]
+    # No local file in the job: the worker fetches PDFs from S3, on any host
+    assert upload_app["jobs"][0][1] == {"upload_id": 1}
+
+
+@pytest.mark.parametrize("filename, size", [("notes.txt", 50_000), ("notes.pdf", 6 * MB)])
+def test_duplicate_is_deleted_after_the_transfer(s3, client_as, upload_app, filename, size):
+    data = payload(size)
+    upload_app["known"][hashlib.sha256(data).hexdigest()] = {"id": 7, "url": "https://cdn.example.test/old"}
+    r = post_file(client_as("t1", "Teacher"), data, filename=filename)
+
+    assert r.status_code == 200
+    assert bucket_keys(s3) == []
+    assert upload_app["added"] == []
+    assert upload_app["duplicates"][0][1] == filename
+
@@ -0,0 +1,193 @@
+# utils/ai_cache.py
+# Response cache in front of the Gemini calls in chatbot_backend.ask_ai.
+# Two tiers: an in-process LRU with TTL, and (AI_CACHE_SHARED=postgres) the
+# `ai_cache` table shared by every gunicorn worker. The table is created by
+# db.init_db(). Keys are the normalized prompt + model name.
+import hashlib
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from db import db_cursor
+
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1000"))       # entries per process
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "86400"))      # seconds
+AI_CACHE_SEED = int(os.getenv("AI_CACHE_SEED", "500"))        # ai_logs rows loaded on warm start
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the answer."""
+    return " ".join(prompt.lower().split()).rstrip("?!. ")
+
+
+def cache_key(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class PostgresCache:
+    """Shared tier: the `ai_cache` table."""
+
+    def __init__(self, ttl: float = AI_CACHE_TTL):
+        self.ttl = ttl
+
+    def get(self, key):
+        with db_cursor() as cur:
+            cur.execute("""
+                SELECT answer FROM ai_cache
+                WHERE key = %s AND created_at > NOW() - %s * INTERVAL '1 second';
+            """, (key, self.ttl))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def set(self, key, model: str, value: str):
+        with db_cursor() as cur:
+            cur.execute("""
+                INSERT INTO ai_cache (key, model, answer) VALUES (%s, %s, %s)
+                ON CONFLICT (key) DO UPDATE
+                SET answer = EXCLUDED.answer, created_at = NOW();
+            """, (key, model, value))
+
+    def prune(self):
+        with db_cursor() as cur:
+            cur.execute(
+                "DELETE FROM ai_cache WHERE created_at <= NOW() - %s * INTERVAL '1 second';",
+                (self.ttl,)
+            )
+
+
+class ResponseCache:
+    """Local LRU in front of the optional shared tier, with hit/miss counters."""
+
+    def __init__(self, local: LRUCache, shared: PostgresCache | None = None):
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._local_hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._seeded = 0
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, prompt: str, model: str):
+        key = cache_key(prompt, model)
+        answer = self.local.get(key)
+        if answer is not None:
+            self._count("_local_hits")
+            return answer
+
+        if self.shared is not None:
+            try:
+                answer = self.shared.get(key)
+            except Exception:
+                traceback.print_exc()   # a cache outage must not break the chat
+                answer = None
+            if answer is not None:
+                self.local.set(key, answer)
+                self._count("_shared_hits")
+                return answer
+
+        self._count("_misses")
+        return None
+
+    def set(self, prompt: str, model: str, answer: str):
+        key = cache_key(prompt, model)
+        self.local.set(key, answer)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, model, answer)
+            except Exception:
+                traceback.print_exc()
+
+    def seed_from_ai_logs(self, model: str, limit: int = AI_CACHE_SEED):
+        """Warm the local tier with recent chat answers (newest end up most recent)."""
+        with db_cursor() as cur:
+            cur.execute("""
+                SELECT question, answer FROM ai_logs
+                WHERE created_at > NOW() - %s * INTERVAL '1 second'
+                  AND answer NOT LIKE 'AI Error:%%'
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s;
+            """, (self.local.ttl, limit))
+            rows = cur.fetchall()
+
+        for question, answer in reversed(rows):
+            if question.strip():
+                self.local.set(cache_key(question, model), answer)
+        with self._lock:
+            self._seeded += len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._local_hits + self._shared_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self.local),
+                "local_hits": self._local_hits,
+                "shared_hits": self._shared_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "seeded": self._seeded,
+                "shared": self.shared is not None,
+            }
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_response_cache(model: str | None = None) -> ResponseCache:
+    """Process-wide cache, seeded from ai_logs the first time it is used."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                shared = PostgresCache() if os.getenv("AI_CACHE_SHARED", "none") == "postgres" else None
+                cache = ResponseCache(LRUCache(), shared)
+                try:
+                    if shared is not None:
+                        shared.prune()
+                    if model and AI_CACHE_SEED > 0:
+                        cache.seed_from_ai_logs(model)
+                except Exception:
+                    traceback.print_exc()
+                _cache = cache
+    return _cache
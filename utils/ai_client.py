@@ -0,0 +1,255 @@
+# utils/ai_client.py
+# Gemini client shared by the web app and the desktop chatbot:
+#   - per-call deadline (a slow response can't pin a worker),
+#   - global concurrency limit + token bucket (provider rate limits),
+#   - single-flight: identical prompts in flight share one call,
+#   - retries with full-jitter exponential backoff on transient errors.
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "30"))                # seconds per ask, retries included
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))   # calls in flight per process
+AI_RATE_PER_MIN = float(os.getenv("AI_RATE_PER_MIN", "60"))      # token bucket refill
+AI_BURST = int(os.getenv("AI_BURST", "10"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_RETRY_BASE = float(os.getenv("AI_RETRY_BASE", "0.5"))         # seconds, doubled per attempt
+
+# HTTP statuses (google.api_core errors carry them in .code) worth retrying
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class AITimeout(TimeoutError):
+    """The call didn't finish (or couldn't start) before its deadline."""
+
+
+class FakeStreamingModel:
+    """Offline stand-in for local runs and load tests (GEMINI_FAKE=1)."""
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        chunks = [SimpleNamespace(text=w + " ") for w in f"(offline) You asked: {prompt}".split()]
+        if stream:
+            return iter(chunks)
+        return SimpleNamespace(text="".join(c.text for c in chunks))
+
+
+def make_model(model_name: str):
+    if os.getenv("GEMINI_FAKE") == "1":
+        return FakeStreamingModel()
+
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(model_name)
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (ConnectionError, TimeoutError)) and not isinstance(exc, AITimeout):
+        return True
+    return getattr(exc, "code", None) in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Take a token, waiting until `deadline` (monotonic) at most."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """Callers with the same key while one call is running get its result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout: float):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = SimpleNamespace(done=threading.Event(), result=None, error=None)
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise AITimeout("Timed out waiting for an identical in-flight request.")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AIClient:
+    def __init__(self, model_name: str, model=None, timeout: float = AI_TIMEOUT,
+                 max_concurrency: int = AI_MAX_CONCURRENCY, rate_per_min: float = AI_RATE_PER_MIN,
+                 burst: int = AI_BURST, max_retries: int = AI_MAX_RETRIES,
+                 retry_base: float = AI_RETRY_BASE):
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_min / 60.0, burst)
+        self._flights = SingleFlight()
+        # Calls run here so the caller can stop waiting at its deadline
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="ai-call")
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = make_model(self.model_name)
+        return self._model
+
+    def _start(self, fn, deadline: float):
+        """Wait for a concurrency slot and a rate token, then run fn in the pool."""
+        if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise AITimeout("Too many AI requests in flight.")
+        if not self._bucket.acquire(deadline):
+            self._slots.release()
+            raise AITimeout("AI rate limit reached.")
+
+        def run():
+            try:
+                return fn()
+            finally:
+                self._slots.release()   # held until the provider call really ends
+
+        return self._executor.submit(run)
+
+    def _backoff(self, attempt: int, deadline: float, exc: Exception):
+        """Sleep before retry `attempt`, or re-raise if out of retries or time."""
+        if attempt >= self.max_retries or not is_retryable(exc):
+            raise exc
+        delay = random.uniform(0, self.retry_base * (2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise exc
+        time.sleep(delay)
+
+    def _generate(self, prompt: str, deadline: float) -> str:
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AITimeout(f"No AI response within {self.timeout}s.")
+            future = self._start(
+                lambda: self.model.generate_content(prompt, request_options={"timeout": remaining}).text,
+                deadline
+            )
+            try:
+                return future.result(timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                if not future.done():
+                    raise AITimeout(f"No AI response within {self.timeout}s.")
+                self._backoff(attempt, deadline, e)
+                attempt += 1
+
+    def generate(self, prompt: str, timeout: float | None = None) -> str:
+        """Full answer text; identical concurrent prompts share one call."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        key = hashlib.sha256(f"{self.model_name}\0{prompt}".encode("utf-8")).hexdigest()
+        return self._flights.do(key, lambda: self._generate(prompt, deadline), timeout)
+
+    def stream(self, prompt: str, timeout: float | None = None):
+        """
+        Yield answer chunks as they arrive. The deadline covers the whole
+        stream; a call is only retried if it failed before its first chunk.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        attempt = 0
+        while True:
+            chunks = queue.Queue()
+            cancelled = threading.Event()
+            done = object()
+
+            def pump():
+                try:
+                    response = self.model.generate_content(
+                        prompt, stream=True,
+                        request_options={"timeout": max(deadline - time.monotonic(), 0)}
+                    )
+                    for chunk in response:
+                        if cancelled.is_set():
+                            return
+                        chunks.put(chunk.text)
+                    chunks.put(done)
+                except Exception as e:
+                    chunks.put(e)
+
+            self._start(pump, deadline)
+            started = False
+            try:
+                while True:
+                    try:
+                        item = chunks.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        raise AITimeout(f"No AI response within {self.timeout}s.")
+                    if item is done:
+                        return
+                    if isinstance(item, Exception):
+                        if started:
+                            raise item
+                        break
+                    started = True
+                    if item:
+                        yield item
+            finally:
+                cancelled.set()
+
+            self._backoff(attempt, deadline, item)
+            attempt += 1
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_ai_client(model_name: str) -> AIClient:
+    """Process-wide client per model (shares the limiter and in-flight calls)."""
+    client = _clients.get(model_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(model_name)
+            if client is None:
+                client = _clients[model_name] = AIClient(model_name)
+    return client
@@ -1,31 +1,263 @@
 # utils/ai_logs.py
-from psycopg2.extras import RealDictCursor
-from db import get_db_connection
+# Chat Q/A logs. Chat routes hand entries to AILogBuffer, which writes them to
+# ai_logs in batches from a background thread (one multi-row INSERT per
+# flush), so answering a question doesn't wait on the DB.
+import atexit
+import os
+import queue
+import threading
+import time
+import traceback
 
+import psycopg2
+from psycopg2.extras import execute_values
 
-def load_ai_logs():
-    """Return all AI logs (latest first)."""
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("""
-        SELECT id, username, question, answer, created_at
-        FROM ai_logs
-        ORDER BY created_at DESC;
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+from db import PoolTimeout, db_cursor
+from utils.pagination import split_page
+from utils.question_index import index_question
+
+AI_LOG_BATCH = int(os.getenv("AI_LOG_BATCH", "200"))                   # rows per INSERT
+AI_LOG_FLUSH_INTERVAL = float(os.getenv("AI_LOG_FLUSH_INTERVAL", "1"))  # seconds
+AI_LOG_MAX_PENDING = int(os.getenv("AI_LOG_MAX_PENDING", "10000"))      # buffered rows; newer ones are dropped beyond this
+
+# The DB being unreachable is worth retrying; anything else is a problem with the rows
+RETRYABLE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout)
+
+
+def load_ai_logs_page(cursor=None, limit: int = 25):
+    """One page of AI logs (latest first), without answers. Returns (rows, next_cursor)."""
+    with db_cursor(dict_rows=True) as cur:
+        if cursor:
+            cur.execute("""
+                SELECT id, username, question, created_at
+                FROM ai_logs
+                WHERE (created_at, id) < (%s, %s)
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s;
+            """, (*cursor, limit + 1))
+        else:
+            cur.execute("""
+                SELECT id, username, question, created_at
+                FROM ai_logs
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s;
+            """, (limit + 1,))
+        rows = cur.fetchall()
+    return split_page(rows, limit, "created_at")
+
+
+def count_ai_logs() -> int:
+    with db_cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM ai_logs;")
+        return cur.fetchone()[0]
 
 
 def save_ai_log(question: str, answer: str, username: str):
-    """Insert one AI Q/A into DB."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO ai_logs (username, question, answer)
-        VALUES (%s, %s, %s);
-    """, (username, question, answer))
-    conn.commit()
-    cur.close()
-    conn.close()
+    """Insert one AI Q/A into DB (and the near-duplicate question index)."""
+    with db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO ai_logs (username, question, answer)
+            VALUES (%s, %s, %s)
+            RETURNING id;
+        """, (_clean(username), _clean(question), _clean(answer)))
+        log_id = cur.fetchone()[0]
+
+    if not answer.startswith("AI Error:"):
+        index_question(log_id, question)
+    return log_id
+
+
+def _clean(text) -> str:
+    # Postgres text can't hold NUL characters (psycopg2 raises ValueError)
+    return (text or "").replace("\x00", "")
+
+
+def _index_logged(rows):
+    for log_id, question, answer in rows:
+        if not answer.startswith("AI Error:"):
+            index_question(log_id, question)
+
+
+class AILogBuffer:
+    """
+    Bounded in-process buffer of (username, question, answer) rows.
+    A flusher thread inserts up to `batch_size` rows at a time, as soon as a
+    batch is full or `interval` seconds after its first row. If the DB is
+    slow or down, the failed batch is retried and new rows queue up to
+    `max_pending`; past that they are dropped (and counted). A batch that
+    fails for any other reason is written row by row, and the rows the DB
+    refuses are dropped and counted as rejected.
+    """
+
+    def __init__(self, batch_size: int = AI_LOG_BATCH, interval: float = AI_LOG_FLUSH_INTERVAL,
+                 max_pending: int = AI_LOG_MAX_PENDING):
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval
+        self._q = queue.Queue(max(max_pending, 1))
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._retrying = 0
+
+        self._written = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._flush_total = 0.0
+        self._flush_last = 0.0
+        self._flush_max = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="ai-log-flusher", daemon=True)
+        self._thread.start()
+
+    def add(self, username: str, question: str, answer: str) -> bool:
+        """Queue one entry; False if the buffer was full and it was dropped."""
+        try:
+            self._q.put_nowait((_clean(username), _clean(question), _clean(answer)))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+    def _take_batch(self) -> list:
+        """Block for a first row, then collect until the batch is full or `interval` passed."""
+        batch = []
+        try:
+            batch.append(self._q.get(timeout=self.interval))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._stop.is_set() or remaining <= 0:
+                    batch.append(self._q.get_nowait())
+                else:
+                    batch.append(self._q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch: list) -> list:
+        with db_cursor() as cur:
+            return execute_values(cur, """
+                INSERT INTO ai_logs (username, question, answer) VALUES %s
+                RETURNING id, question, answer;
+            """, batch, page_size=len(batch), fetch=True)
+
+    def _insert_each(self, batch: list) -> list:
+        """Row-by-row fallback for a batch the DB refused; bad rows are dropped."""
+        rows = []
+        for i, entry in enumerate(batch):
+            try:
+                rows.extend(self._insert([entry]))
+            except RETRYABLE_ERRORS:
+                # Lost the DB half-way: the rows before it are saved, keep the rest for the next attempt
+                self._record(rows)
+                del batch[:i]
+                raise
+            except Exception:
+                traceback.print_exc()
+                with self._lock:
+                    self._rejected += 1
+        return rows
+
+    def _flush(self, batch: list) -> bool:
+        """Write `batch`; False (with the unwritten rows left in it) to retry later."""
+        started = time.perf_counter()
+        try:
+            try:
+                rows = self._insert(batch)
+            except RETRYABLE_ERRORS:
+                raise
+            except Exception:
+                traceback.print_exc()
+                rows = None
+            if rows is None:
+                rows = self._insert_each(batch)
+        except RETRYABLE_ERRORS:
+            traceback.print_exc()
+            with self._lock:
+                self._failed_flushes += 1
+            return False
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._flushes += 1
+            self._flush_total += elapsed
+            self._flush_last = elapsed
+            self._flush_max = max(self._flush_max, elapsed)
+        self._record(rows)
+        return True
+
+    def _record(self, rows: list):
+        """Count and index rows that reached the table."""
+        with self._lock:
+            self._written += len(rows)
+        try:
+            _index_logged(rows)
+        except Exception:
+            traceback.print_exc()   # the rows are saved; only near-duplicate reuse misses them
+
+    def _run(self):
+        batch = []
+        while True:
+            if not batch:
+                if self._stop.is_set() and self._q.empty():
+                    return
+                batch = self._take_batch()
+                self._retrying = 0
+            if not batch:
+                continue
+            if self._flush(batch):
+                batch = []
+            else:
+                self._retrying = len(batch)
+                if self._stop.wait(self.interval):
+                    # Shutting down with the DB unreachable: give up on what's left
+                    with self._lock:
+                        self._dropped += len(batch) + self._q.qsize()
+                    return
+
+    def close(self, timeout: float = 10.0):
+        """Flush what's buffered and stop the flusher (at worker shutdown)."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._q.qsize() + self._retrying,
+                "written": self._written,
+                "dropped": self._dropped,
+                "rejected": self._rejected,
+                "flushes": self._flushes,
+                "failed_flushes": self._failed_flushes,
+                "flush_last_ms": round(self._flush_last * 1000, 1),
+                "flush_avg_ms": round(self._flush_total / self._flushes * 1000, 1) if self._flushes else 0.0,
+                "flush_max_ms": round(self._flush_max * 1000, 1),
+            }
+
+
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def get_ai_log_buffer() -> AILogBuffer:
+    """Process-wide buffer (re-created after a fork); flushed at interpreter exit."""
+    global _buffer, _buffer_pid
+    pid = os.getpid()
+    if _buffer is None or _buffer_pid != pid:
+        with _buffer_lock:
+            if _buffer is None or _buffer_pid != pid:
+                _buffer = AILogBuffer()
+                _buffer_pid = pid
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def queue_ai_log(question: str, answer: str, username: str) -> bool:
+    """Log one AI Q/A without waiting for the DB (see AILogBuffer)."""
+    return get_ai_log_buffer().add(username, question, answer)
@@ -1,16 +1,173 @@
-def generate_ai_tags(file_name):
-    name = file_name.lower()
-    tags = set()
-
-    if "python" in name: tags.update(["Python", "Programming"])
-    if "c" in name: tags.update(["C Language", "Coding"])
-    if "dsa" in name or "data" in name: tags.update(["Data Structures", "Algorithms"])
-    if "sql" in name or "db" in name: tags.update(["SQL", "Database"])
-    if "ai" in name or "ml" in name: tags.update(["AI", "Machine Learning"])
-    if "cloud" in name: tags.update(["Cloud", "AWS"])
-    if "network" in name: tags.update(["Networking"])
-    if "java" in name: tags.update(["Java", "OOP"])
-    if "os" in name: tags.update(["Operating System"])
-    if not tags: tags.update(["General Study Material"])
-
-    return list(tags)
+# utils/ai_tags.py
+# Tagging engine: a keyword/alias matcher compiled once from the shared
+# vocabulary (utils/tag_vocabulary.json) and run over the filename plus, when
+# available, the extracted PDF text.
+#   - Matching is on whole tokens ("os" no longer hits "purpose", "c" no
+#     longer hits every name containing the letter), with multi-word aliases
+#     found in one pass by an Aho-Corasick automaton over the token stream.
+#   - A longer alias hides the shorter ones inside it ("binary search tree"
+#     doesn't also count as "binary search").
+#   - Tags come back weighted 0..1: filename hits weigh most, text hits by how
+#     often the topic comes up relative to the document's main topic.
+import json
+import os
+import re
+import threading
+from collections import Counter, deque
+
+TAG_VOCABULARY = os.getenv(
+    "TAG_VOCABULARY", os.path.join(os.path.dirname(__file__), "tag_vocabulary.json")
+)
+TAG_NAME_WEIGHT = 0.7       # a filename hit on its own
+TAG_MIN_TEXT_HITS = 3       # text-only tags need this many mentions
+TAG_IMPLIED_FACTOR = 0.5    # implied tag weight = parent weight * factor
+TAG_MIN_WEIGHT = float(os.getenv("TAG_MIN_WEIGHT", "0.25"))
+TAG_MAX = int(os.getenv("TAG_MAX", "6"))
+FALLBACK_TAG = "General Study Material"
+
+_CAMEL = re.compile(r"(?<=[a-z])(?=[A-Z])")
+_TOKEN = re.compile(r"[a-z0-9]+(?:\+\+|#)?")
+
+
+def _norm(token: str) -> str:
+    # Plurals match their singular ("linked lists", "networks")
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens; splits camelCase, _, -, . and punctuation."""
+    return [_norm(t) for t in _TOKEN.findall(_CAMEL.sub(" ", text).lower())]
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton whose alphabet is tokens rather than characters."""
+
+    def __init__(self, patterns):
+        """patterns: iterable of (token tuple, value)."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]   # (pattern length, value) ending at each state
+
+        for tokens, value in patterns:
+            state = 0
+            for tok in tokens:
+                nxt = self._goto[state].get(tok)
+                if nxt is None:
+                    nxt = self._goto[state][tok] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(tokens), value))
+
+        # Breadth-first failure links; each state also reports its suffixes' matches
+        todo = deque(self._goto[0].values())
+        while todo:
+            state = todo.popleft()
+            for tok, nxt in self._goto[state].items():
+                todo.append(nxt)
+                f = self._fail[state]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(tok, 0)
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+
+    def find(self, tokens):
+        """(start, end, value) for every alias occurrence in the token list."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, tok in enumerate(tokens):
+            while state and tok not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tok, 0)
+            for length, value in out[state]:
+                yield i + 1 - length, i + 1, value
+
+    def find_longest(self, tokens):
+        """Like find(), minus matches lying inside a longer one."""
+        matches = sorted(self.find(tokens), key=lambda m: (m[0], m[0] - m[1]))
+        covered, last = 0, None
+        for start, end, value in matches:
+            # Sorted by start, longest first: inside an earlier match iff it ends by `covered`
+            if end > covered or (start, end) == last:
+                covered, last = max(covered, end), (start, end)
+                yield start, end, value
+
+
+class Tagger:
+    """Compiled vocabulary: {tag: {"aliases": [...], "name_aliases": [...], "implies": [...]}}."""
+
+    def __init__(self, vocabulary: dict):
+        patterns = []
+        self.implies = {}
+        for tag, entry in vocabulary.items():
+            if tag.startswith("_"):
+                continue   # "_comment" etc.
+            for alias in entry.get("aliases", []):
+                patterns.append((tuple(tokenize(alias)), (tag, False)))
+            for alias in entry.get("name_aliases", []):
+                patterns.append((tuple(tokenize(alias)), (tag, True)))
+            self.implies[tag] = entry.get("implies", [])
+        self.matcher = KeywordMatcher(p for p in patterns if p[0])
+
+    def _hits(self, tokens, in_name: bool) -> Counter:
+        hits = Counter()
+        for _, _, (tag, name_only) in self.matcher.find_longest(tokens):
+            if in_name or not name_only:
+                hits[tag] += 1
+        return hits
+
+    def weights(self, filename: str, text: str | None = None) -> dict:
+        """{tag: weight}, heaviest first; the fallback tag if nothing matched."""
+        name_hits = self._hits(tokenize(filename or ""), in_name=True)
+        text_hits = self._hits(tokenize(text), in_name=False) if text else Counter()
+        top = max(text_hits.values(), default=0)
+
+        scores = {}
+        for tag in name_hits.keys() | text_hits.keys():
+            name_score = TAG_NAME_WEIGHT if tag in name_hits else 0.0
+            hits = text_hits[tag]
+            # A passing mention doesn't make a topic, unless the filename agrees
+            text_score = hits / top if hits >= TAG_MIN_TEXT_HITS or (name_score and hits) else 0.0
+            scores[tag] = 1 - (1 - name_score) * (1 - text_score)
+
+        for tag, weight in list(scores.items()):
+            for implied in self.implies.get(tag, ()):
+                scores[implied] = max(scores.get(implied, 0.0), weight * TAG_IMPLIED_FACTOR)
+
+        ranked = sorted(
+            ((tag, round(w, 3)) for tag, w in scores.items() if w >= TAG_MIN_WEIGHT),
+            key=lambda item: (-item[1], item[0])
+        )
+        return dict(ranked[:TAG_MAX]) or {FALLBACK_TAG: 1.0}
+
+
+def load_vocabulary(path: str = TAG_VOCABULARY) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_tagger = None
+_lock = threading.Lock()
+
+
+def get_tagger() -> Tagger:
+    """Process-wide tagger, compiled from the vocabulary file on first use."""
+    global _tagger
+    if _tagger is None:
+        with _lock:
+            if _tagger is None:
+                _tagger = Tagger(load_vocabulary())
+    return _tagger
+
+
+def tag_weights(file_name: str, text: str | None = None) -> dict:
+    """Weighted tags ({tag: 0..1}) for a file from its name and optional text."""
+    return get_tagger().weights(file_name, text)
+
+
+def generate_ai_tags(file_name: str, text: str | None = None) -> list[str]:
+    """Tag names for a file, heaviest first."""
+    return list(tag_weights(file_name, text))
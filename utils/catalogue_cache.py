@@ -0,0 +1,287 @@
+# utils/catalogue_cache.py
+# Local SQLite catalogue for the desktop dashboards (student / teacher /
+# admin), so filtering and searching never goes back to S3 or re-reads the
+# JSON files:
+#   - S3 objects: a refresh still has to list the bucket (S3 has no "changed
+#     since" query), but only keys whose ETag / LastModified differ from the
+#     cached copy are re-tagged and written, and keys gone from the bucket are
+#     dropped once a listing completes.
+#   - uploads.json / users.json: re-imported only when the file's mtime or
+#     size changed since the last import.
+# Search is a LIKE over a lowercased filename + tags column; at tens of
+# thousands of objects a query takes a few milliseconds.
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.ai_tags import generate_ai_tags
+from utils.file_types import file_kind
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CATALOGUE_DB = os.getenv("CATALOGUE_DB", os.path.join(BASE_DIR, "catalogue.sqlite"))
+
+LIST_PAGE_SIZE = 1000    # keys per ListObjectsV2 call (S3 maximum)
+SCHEMA_VERSION = 2       # bump when the tables change; the cache is rebuilt
+
+# Dashboard type filter -> file_kind() values
+FILTER_KINDS = {
+    "PDF": ("pdf",),
+    "Video": ("video",),
+    "Image": ("image",),
+    "Other": ("doc", "other"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,            -- file name shown (web uploads are keyed materials/<uuid>/<name>)
+    etag TEXT,
+    size INTEGER,
+    last_modified TEXT,            -- "YYYY-MM-DD HH:MM" (UTC, as listed)
+    kind TEXT NOT NULL,
+    tags TEXT NOT NULL,            -- comma-separated, heaviest first
+    search TEXT NOT NULL,          -- lower(name + tags), what search matches against
+    PRIMARY KEY (bucket, key)
+);
+CREATE INDEX IF NOT EXISTS idx_objects_kind ON objects (bucket, kind, name);
+
+CREATE TABLE IF NOT EXISTS recorded_uploads (
+    id INTEGER PRIMARY KEY,        -- position in uploads.json
+    filename TEXT NOT NULL,
+    url TEXT,
+    uploaded_on TEXT,
+    tags TEXT NOT NULL,
+    search TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    role TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,         -- "s3:<bucket>" or a JSON file path
+    mtime_ns INTEGER,
+    size INTEGER,
+    synced_at REAL
+);
+"""
+
+
+def _like(query: str) -> str:
+    """LIKE pattern matching `query` anywhere, with %, _ and \\ taken literally."""
+    escaped = query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _search_text(filename: str, tags: str) -> str:
+    return f"{filename} {tags}".lower()
+
+
+class Catalogue:
+    """One SQLite file shared by every dashboard on this machine."""
+
+    def __init__(self, path: str = CATALOGUE_DB):
+        self.path = path
+        # Listing runs on a worker thread while the UI queries; one connection, one lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+            if self._conn.execute("PRAGMA user_version;").fetchone()[0] != SCHEMA_VERSION:
+                # Only a cache: rebuild it rather than migrate
+                self._conn.executescript("""
+                    DROP TABLE IF EXISTS objects; DROP TABLE IF EXISTS recorded_uploads;
+                    DROP TABLE IF EXISTS users; DROP TABLE IF EXISTS sources;
+                """)
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+            self._conn.executescript(SCHEMA)
+
+    # -------------------------------------------------
+    # S3 objects
+    # -------------------------------------------------
+    def sync_s3(self, s3, bucket: str, on_page=None, cancelled=None) -> dict:
+        """
+        Bring the cached listing of `bucket` up to date. on_page(changed) is
+        called after each listed page that added or changed objects;
+        cancelled() returning True stops early (deletions are then skipped).
+        Returns {"added", "changed", "removed", "total"}.
+        """
+        with self._lock:
+            known = dict(self._conn.execute(
+                "SELECT key, etag || '|' || last_modified FROM objects WHERE bucket = ?;", (bucket,)
+            ).fetchall())
+        stats = {"added": 0, "changed": 0, "removed": 0, "total": 0}
+
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, PaginationConfig={"PageSize": LIST_PAGE_SIZE}):
+            if cancelled and cancelled():
+                return stats
+            rows = []
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                name = os.path.basename(key)
+                modified = obj["LastModified"].strftime("%Y-%m-%d %H:%M")
+                version = f"{obj.get('ETag', '')}|{modified}"
+                previous = known.pop(key, None)
+                stats["total"] += 1
+                if previous == version:
+                    continue
+                stats["added" if previous is None else "changed"] += 1
+                tags = ", ".join(generate_ai_tags(name))
+                rows.append((bucket, key, name, obj.get("ETag", ""), obj.get("Size", 0), modified,
+                             file_kind(name), tags, _search_text(name, tags)))
+            if rows:
+                with self._lock, self._conn:
+                    self._conn.executemany("""
+                        INSERT OR REPLACE INTO objects
+                            (bucket, key, name, etag, size, last_modified, kind, tags, search)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+                    """, rows)
+                if on_page:
+                    on_page(len(rows))
+
+        # Whatever wasn't listed has been deleted from the bucket
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM objects WHERE bucket = ? AND key = ?;",
+                                   [(bucket, key) for key in known])
+            self._conn.execute("""
+                INSERT OR REPLACE INTO sources (name, synced_at) VALUES (?, ?);
+            """, (f"s3:{bucket}", time.time()))
+        stats["removed"] = len(known)
+        return stats
+
+    def last_synced(self, bucket: str):
+        """Unix time of the last completed S3 sync, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT synced_at FROM sources WHERE name = ?;",
+                                     (f"s3:{bucket}",)).fetchone()
+        return row[0] if row else None
+
+    def objects(self, bucket: str, file_type: str = "All", query: str = "") -> list[tuple]:
+        """(key, name, last_modified, tags) rows in name order, filtered like the dashboard."""
+        sql = "SELECT key, name, last_modified, tags FROM objects WHERE bucket = ?"
+        params = [bucket]
+        kinds = FILTER_KINDS.get(file_type)
+        if kinds:
+            sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if query:
+            sql += " AND search LIKE ? ESCAPE '\\'"
+            params.append(_like(query))
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY name, key;", params).fetchall()
+
+    def object_count(self, bucket: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM objects WHERE bucket = ?;", (bucket,)).fetchone()[0]
+
+    def missing_from_bucket(self, bucket: str) -> list[str]:
+        """Filenames recorded in uploads.json that the cached listing doesn't have."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("""
+                SELECT DISTINCT r.filename FROM recorded_uploads r
+                WHERE NOT EXISTS (SELECT 1 FROM objects o WHERE o.bucket = ? AND o.key = r.filename)
+                ORDER BY r.filename;
+            """, (bucket,))]
+
+    # -------------------------------------------------
+    # uploads.json / users.json
+    # -------------------------------------------------
+    def _file_changed(self, path: str):
+        """(mtime_ns, size) if `path` differs from its last import, else None."""
+        try:
+            st = os.stat(path)
+            current = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            current = (None, None)
+        with self._lock:
+            row = self._conn.execute("SELECT mtime_ns, size FROM sources WHERE name = ?;", (path,)).fetchone()
+        return None if row is not None and tuple(row) == current else current
+
+    def _read_json(self, path: str, default):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _mark_imported(self, path: str, version):
+        self._conn.execute("""
+            INSERT OR REPLACE INTO sources (name, mtime_ns, size, synced_at) VALUES (?, ?, ?, ?);
+        """, (path, version[0], version[1], time.time()))
+
+    def sync_uploads_json(self, path: str) -> bool:
+        """Re-import uploads.json if it changed; True if it was re-read."""
+        version = self._file_changed(path)
+        if version is None:
+            return False
+        uploads = self._read_json(path, [])
+        rows = []
+        for i, f in enumerate(uploads if isinstance(uploads, list) else []):
+            filename = f.get("filename", "")
+            tags = ", ".join(f.get("tags", []))
+            rows.append((i, filename, f.get("url", ""), f.get("uploaded_on", ""), tags,
+                         _search_text(filename, tags)))
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM recorded_uploads;")
+            self._conn.executemany("""
+                INSERT INTO recorded_uploads (id, filename, url, uploaded_on, tags, search)
+                VALUES (?, ?, ?, ?, ?, ?);
+            """, rows)
+            self._mark_imported(path, version)
+        return True
+
+    def recorded_uploads(self, query: str = "") -> list[tuple]:
+        """(filename, url, uploaded_on, tags) rows, newest first."""
+        sql = "SELECT filename, url, uploaded_on, tags FROM recorded_uploads"
+        params = []
+        if query:
+            sql += " WHERE search LIKE ? ESCAPE '\\'"
+            params.append(_like(query))
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY id DESC;", params).fetchall()
+
+    def sync_users_json(self, path: str) -> bool:
+        """Re-import users.json ({username: {"role": ...}}) if it changed."""
+        version = self._file_changed(path)
+        if version is None:
+            return False
+        users = self._read_json(path, {})
+        rows = [(username, (info or {}).get("role", "Unknown"))
+                for username, info in (users.items() if isinstance(users, dict) else [])]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM users;")
+            self._conn.executemany("INSERT INTO users (username, role) VALUES (?, ?);", rows)
+            self._mark_imported(path, version)
+        return True
+
+    def users(self) -> list[tuple]:
+        """(username, role) rows in file order."""
+        with self._lock:
+            return self._conn.execute("SELECT username, role FROM users ORDER BY rowid;").fetchall()
+
+    def role_counts(self) -> dict:
+        with self._lock:
+            return dict(self._conn.execute("SELECT role, COUNT(*) FROM users GROUP BY role;").fetchall())
+
+    def recorded_upload_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM recorded_uploads;").fetchone()[0]
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue() -> Catalogue:
+    """The process-wide catalogue (opened on first use)."""
+    global _catalogue
+    if _catalogue is None:
+        with _catalogue_lock:
+            if _catalogue is None:
+                _catalogue = Catalogue()
+    return _catalogue
@@ -0,0 +1,103 @@
+# utils/content_search.py
+# Full-text search over PDF contents. Page text lives in pdf_pages (filled by
+# utils/pdf_extract.py as uploads are processed) with a generated tsvector
+# column + GIN index; uploads link to it through content_hash.
+from markupsafe import Markup, escape
+
+from db import db_cursor
+from utils.pagination import encode_rank_cursor
+from utils.pdf_extract import PDFExtractError, extract_pdf_pages
+
+SEARCH_PAGES_PER_DOC = 3           # page snippets shown per result
+SEARCH_MAX_PAGES = 5000            # best-ranked matching pages grouped into results per query
+SEARCH_CONFIG = "english"
+
+# ts_headline markers: control chars can't come from the query, and are
+# swapped for <mark> after the snippet has been HTML-escaped
+_SEL_START, _SEL_STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = (
+    f"StartSel={_SEL_START}, StopSel={_SEL_STOP}, "
+    "MaxWords=30, MinWords=12, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+
+
+def index_pdf(path: str, content_hash: str) -> int:
+    """Make sure every page of the PDF is in pdf_pages; returns the page count."""
+    try:
+        return len(extract_pdf_pages(path, content_hash))
+    except PDFExtractError as e:
+        print(f"INDEX skipped => {e}")
+        return 0
+
+
+def _highlight(headline: str) -> Markup:
+    html = str(escape(headline))
+    return Markup(html.replace(_SEL_START, "<mark>").replace(_SEL_STOP, "</mark>"))
+
+
+def search_contents(query: str, limit: int = 20, cursor=None):
+    """
+    Uploads whose PDF text matches `query` (web-search syntax: "phrases",
+    OR, -exclude), best first. Each row gets `snippets`: [{page, html}].
+    `cursor` is the (score, id) of the last row already shown.
+    Returns (rows, next_cursor) -- next_cursor is None on the last page.
+    """
+    after_score, after_id = cursor or (None, None)
+    with db_cursor(dict_rows=True) as cur:
+        # Each matching page is ranked once; only the best SEARCH_MAX_PAGES of them
+        # are grouped, joined and sorted into documents. Ties are broken by
+        # (content_hash, page_no) so the candidate set, and with it the scores the
+        # keyset cursor compares, is the same on every page of results.
+        # Scores are float8 so the cursor's score compares exactly.
+        cur.execute(f"""
+            WITH q AS (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', %(q)s) AS query),
+            hits AS (
+                SELECT p.content_hash, p.page_no, ts_rank_cd(p.tsv, q.query) AS rank
+                FROM pdf_pages p, q
+                WHERE p.tsv @@ q.query
+                ORDER BY rank DESC, p.content_hash, p.page_no
+                LIMIT %(max_pages)s
+            ),
+            docs AS (
+                SELECT content_hash,
+                       SUM(rank)::float8 AS score,
+                       (array_agg(page_no ORDER BY rank DESC, page_no))[1:%(pages)s] AS pages
+                FROM hits
+                GROUP BY content_hash
+            )
+            SELECT u.id, u.filename, u.url, u.uploaded_by, u.uploaded_at, u.content_hash,
+                   d.score, d.pages
+            FROM docs d
+            JOIN uploads u ON u.content_hash = d.content_hash AND u.status = 'ready'
+            WHERE %(after_id)s::int IS NULL OR (d.score, u.id) < (%(after_score)s::float8, %(after_id)s::int)
+            ORDER BY d.score DESC, u.id DESC
+            LIMIT %(limit)s;
+        """, {"q": query, "max_pages": SEARCH_MAX_PAGES, "pages": SEARCH_PAGES_PER_DOC,
+              "after_score": after_score, "after_id": after_id, "limit": limit + 1})
+        rows = cur.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_rank_cursor(rows[-1]["score"], rows[-1]["id"])
+        if not rows:
+            return [], None
+
+        # Snippets only for the pages on this result page (ts_headline is costly)
+        wanted = {(r["content_hash"], p) for r in rows for p in r["pages"]}
+        hashes, pages = zip(*wanted)
+        cur.execute(f"""
+            SELECT p.content_hash, p.page_no, ts_headline('{SEARCH_CONFIG}', p.text, q.query, %s) AS headline
+            FROM pdf_pages p
+            JOIN unnest(%s::text[], %s::int[]) AS w(content_hash, page_no)
+              ON w.content_hash = p.content_hash AND w.page_no = p.page_no,
+            websearch_to_tsquery('{SEARCH_CONFIG}', %s) AS q(query);
+        """, (HEADLINE_OPTIONS, list(hashes), list(pages), query))
+        headlines = {(h["content_hash"], h["page_no"]): h["headline"] for h in cur.fetchall()}
+
+    for r in rows:
+        r["snippets"] = [
+            {"page": p + 1, "html": _highlight(headlines[(r["content_hash"], p)])}
+            for p in r["pages"] if (r["content_hash"], p) in headlines
+        ]
+    return rows, next_cursor
@@ -0,0 +1,28 @@
+# utils/file_types.py
+import os
+
+# Extension -> kind buckets used by the /files type filter
+FILE_KINDS = {
+    "pdf": [".pdf"],
+    "image": [".jpg", ".jpeg", ".png", ".gif"],
+    "video": [".mp4", ".mov", ".avi", ".mkv"],
+    "doc": [".doc", ".docx", ".txt", ".ppt", ".pptx", ".xls", ".xlsx"],
+}
+
+_EXT_TO_KIND = {ext: kind for kind, exts in FILE_KINDS.items() for ext in exts}
+
+
+def file_kind(filename: str) -> str:
+    """Return 'pdf' / 'image' / 'video' / 'doc' / 'other' for a filename."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return _EXT_TO_KIND.get(ext, "other")
+
+
+def kind_case_sql(column: str = "filename") -> str:
+    """SQL CASE expression computing the same kind as file_kind() (for backfills)."""
+    ext = f"lower(substring({column} from '\\.[^.]*$'))"
+    whens = " ".join(
+        f"WHEN {ext} IN ({', '.join(repr(e) for e in exts)}) THEN '{kind}'"
+        for kind, exts in FILE_KINDS.items()
+    )
+    return f"CASE {whens} ELSE 'other' END"
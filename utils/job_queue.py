@@ -0,0 +1,210 @@
+# utils/job_queue.py
+# Small job queue + worker pool for background work (no external broker).
+# PostgresJobQueue is shared by every gunicorn worker (FOR UPDATE SKIP LOCKED);
+# MemoryJobQueue keeps jobs in-process, for local runs and tests.
+# Payloads are JSON and must not name local files: any host may run the job.
+# The `jobs` table is created by db.init_db().
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from db import db_cursor
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))       # seconds, doubled per attempt
+JOB_LOCK_TIMEOUT = float(os.getenv("JOB_LOCK_TIMEOUT", "900"))     # running jobs older than this are retried
+
+log = logging.getLogger(__name__)
+
+
+class MemoryJobQueue:
+    """In-process queue. Jobs are lost on restart."""
+
+    def __init__(self, max_attempts: int = JOB_MAX_ATTEMPTS, retry_delay: float = JOB_RETRY_DELAY):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._q = queue.Queue()
+        self._ids = iter(range(1, 1 << 62))
+        self._lock = threading.Lock()
+        self.failed = []
+
+    def enqueue(self, kind: str, payload: dict):
+        with self._lock:
+            job_id = next(self._ids)
+        self._q.put({"id": job_id, "kind": kind, "payload": payload, "attempts": 0})
+        return job_id
+
+    def claim(self, timeout: float = 1.0):
+        try:
+            job = self._q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job):
+        pass
+
+    def fail(self, job, error: str) -> bool:
+        """Requeue with backoff; returns True once the job has given up."""
+        if job["attempts"] >= self.max_attempts:
+            self.failed.append((job, error))
+            return True
+        delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+        timer = threading.Timer(delay, self._q.put, args=(job,))
+        timer.daemon = True
+        timer.start()
+        return False
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+
+class PostgresJobQueue:
+    """Durable queue in the `jobs` table, safe across processes and hosts."""
+
+    def __init__(self, max_attempts: int = JOB_MAX_ATTEMPTS, retry_delay: float = JOB_RETRY_DELAY,
+                 lock_timeout: float = JOB_LOCK_TIMEOUT):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock_timeout = lock_timeout
+
+    def enqueue(self, kind: str, payload: dict):
+        with db_cursor() as cur:
+            cur.execute(
+                "INSERT INTO jobs (kind, payload) VALUES (%s, %s) RETURNING id;",
+                (kind, json.dumps(payload))
+            )
+            return cur.fetchone()[0]
+
+    def claim(self, timeout: float = 1.0):
+        with db_cursor(dict_rows=True) as cur:
+            cur.execute("""
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1, locked_at = NOW()
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE (status = 'queued' AND run_after <= NOW())
+                       OR (status = 'running' AND locked_at < NOW() - %s * INTERVAL '1 second')
+                    ORDER BY id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts;
+            """, (self.lock_timeout,))
+            job = cur.fetchone()
+        if job is None:
+            time.sleep(timeout)
+        return job
+
+    def complete(self, job):
+        with db_cursor() as cur:
+            cur.execute("DELETE FROM jobs WHERE id = %s;", (job["id"],))
+
+    def fail(self, job, error: str) -> bool:
+        gave_up = job["attempts"] >= self.max_attempts
+        delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+        with db_cursor() as cur:
+            cur.execute("""
+                UPDATE jobs
+                SET status = %s, last_error = %s, locked_at = NULL,
+                    run_after = NOW() + %s * INTERVAL '1 second'
+                WHERE id = %s;
+            """, ("failed" if gave_up else "queued", error[:2000], delay, job["id"]))
+        return gave_up
+
+    def pending(self) -> int:
+        with db_cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running');")
+            return cur.fetchone()[0]
+
+
+class WorkerPool:
+    """
+    Daemon threads that claim jobs and dispatch them by kind.
+    handlers:   kind -> fn(payload)
+    on_failure: kind -> fn(payload, error), called once a job gives up
+    """
+
+    def __init__(self, job_queue, handlers: dict, size: int = 2, on_failure: dict | None = None,
+                 poll_interval: float = 1.0):
+        self.queue = job_queue
+        self.handlers = handlers
+        self.on_failure = on_failure or {}
+        self.size = size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.size):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.poll_interval)
+            except Exception:
+                log.exception("Claiming a job failed")
+                time.sleep(self.poll_interval)
+                continue
+            if job is None:
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        kind = job["kind"]
+        try:
+            handler = self.handlers[kind]
+            handler(job["payload"])
+            self.queue.complete(job)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            log.warning("Job %s (%s) attempt %s failed => %s", job["id"], kind, job["attempts"], error,
+                        exc_info=True)
+            if self.queue.fail(job, error) and kind in self.on_failure:
+                self.on_failure[kind](job["payload"], error)
+
+
+_queue = None
+_pool = None
+_pid = None
+_lock = threading.RLock()
+
+
+def get_job_queue():
+    """Process-wide queue; JOB_QUEUE=memory selects the in-process one."""
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                if os.getenv("JOB_QUEUE", "postgres") == "memory":
+                    _queue = MemoryJobQueue()
+                else:
+                    _queue = PostgresJobQueue()
+    return _queue
+
+
+def ensure_workers(handlers: dict, on_failure: dict | None = None, size: int | None = None):
+    """Start this process's worker threads once (again after a fork)."""
+    global _pool, _pid
+    pid = os.getpid()
+    if _pool is not None and _pid == pid:
+        return _pool
+    with _lock:
+        if _pool is None or _pid != pid:
+            n = size if size is not None else int(os.getenv("JOB_WORKERS", "2"))
+            _pool = WorkerPool(get_job_queue(), handlers, size=n, on_failure=on_failure)
+            _pool.start()
+            _pid = pid
+    return _pool
@@ -0,0 +1,63 @@
+# utils/pagination.py
+import base64
+from datetime import datetime
+
+
+def _encode(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(token: str) -> str:
+    return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for (timestamp, id) ordered lists."""
+    return _encode(f"{ts.isoformat()}|{row_id}")
+
+
+def decode_cursor(token: str | None):
+    """Return (timestamp, id) or None for a missing / malformed cursor."""
+    if not token:
+        return None
+    try:
+        ts, row_id = _decode(token).rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def encode_rank_cursor(score: float, row_id: int) -> str:
+    """Opaque keyset cursor for (score, id) ranked lists (repr() round-trips the float)."""
+    return _encode(f"{score!r}|{row_id}")
+
+
+def decode_rank_cursor(token: str | None):
+    """Return (score, id) or None for a missing / malformed cursor."""
+    if not token:
+        return None
+    try:
+        score, row_id = _decode(token).rsplit("|", 1)
+        return float(score), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page_limit(raw, default: int, maximum: int) -> int:
+    """Parse a ?limit= value, clamped to 1..maximum."""
+    try:
+        n = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(n, maximum))
+
+
+def split_page(rows: list, limit: int, ts_key: str, id_key: str = "id"):
+    """
+    Trim a LIMIT limit+1 result to `limit` rows.
+    Returns (rows, next_cursor) -- next_cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][ts_key], rows[-1][id_key])
@@ -0,0 +1,181 @@
+# utils/pdf_extract.py
+# PDF text extraction engine:
+#   - page ranges are parsed in a process pool (PyPDF2 is pure Python, so
+#     threads would serialize on the GIL),
+#   - pages are yielded in order as soon as they are ready (generator), and
+#     the caller can stop early (max_chars or just stop iterating),
+#   - page text is stored in `pdf_pages` keyed by (content hash, page index),
+#     so the same PDF is never parsed twice. The table is created by db.init_db().
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PyPDF2 import PdfReader
+
+from db import db_cursor
+from utils.storage_utils import file_sha256
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 4))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))   # smaller PDFs: parse in-thread
+
+
+class PDFExtractError(Exception):
+    """The PDF could not be opened or parsed."""
+
+
+def extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop). Runs in the worker processes."""
+    reader = PdfReader(path)
+    texts = []
+    for i in range(start, stop):
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception as e:
+            # One bad page shouldn't lose the rest of the document
+            print(f"PDF page {i} of {os.path.basename(path)} unreadable => {type(e).__name__}: {e}")
+            texts.append("")
+    return texts
+
+
+# ------------------------------------------------------
+# Process pool (one per process, created on first use)
+# ------------------------------------------------------
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # spawn: forking a threaded web/worker process isn't safe
+                _pool = ProcessPoolExecutor(
+                    PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+# ------------------------------------------------------
+# Page cache (pdf_pages)
+# ------------------------------------------------------
+def load_cached_pages(content_hash: str) -> dict:
+    try:
+        with db_cursor() as cur:
+            cur.execute(
+                "SELECT page_no, text FROM pdf_pages WHERE content_hash = %s;",
+                (content_hash,)
+            )
+            return dict(cur.fetchall())
+    except Exception:
+        traceback.print_exc()   # extract without the cache
+        return {}
+
+
+def cached_text(content_hash: str, max_chars: int | None = None) -> str:
+    """Already extracted text of a PDF, pages in order ("" if not cached)."""
+    pages = load_cached_pages(content_hash) if content_hash else {}
+    text = "\n".join(pages[i] for i in sorted(pages))
+    return text if max_chars is None else text[:max_chars]
+
+
+def store_pages(content_hash: str, start: int, texts: list[str]):
+    try:
+        with db_cursor() as cur:
+            cur.executemany("""
+                INSERT INTO pdf_pages (content_hash, page_no, text) VALUES (%s, %s, %s)
+                ON CONFLICT (content_hash, page_no) DO NOTHING;
+            """, [(content_hash, start + i, text.replace("\x00", "")) for i, text in enumerate(texts)])
+    except Exception:
+        traceback.print_exc()
+
+
+# ------------------------------------------------------
+# Extraction
+# ------------------------------------------------------
+def _missing_ranges(page_count: int, cached: dict):
+    """Consecutive uncached pages, cut into PDF_PAGES_PER_TASK-sized ranges."""
+    ranges, start = [], None
+    for i in range(page_count + 1):
+        missing = i < page_count and i not in cached
+        if missing and start is None:
+            start = i
+        if start is not None and (not missing or i - start == PDF_PAGES_PER_TASK):
+            ranges.append((start, i))
+            start = i if missing else None
+    return ranges
+
+
+def iter_pdf_pages(path: str, content_hash: str | None = None, max_chars: int | None = None):
+    """
+    Yield (page_index, text) in page order. Stops after max_chars characters
+    of text when given. Raises PDFExtractError if the PDF can't be read.
+    """
+    if not os.path.exists(path):
+        raise PDFExtractError(f"No such file: {path}")
+    try:
+        page_count = len(PdfReader(path).pages)
+    except Exception as e:
+        raise PDFExtractError(f"Unreadable PDF {os.path.basename(path)}: {e}") from e
+
+    content_hash = content_hash or file_sha256(path)
+    cached = load_cached_pages(content_hash)
+    ranges = _missing_ranges(page_count, cached)
+
+    parallel = (PDF_EXTRACT_WORKERS > 1 and len(ranges) > 1
+                and page_count - len(cached) >= PDF_PARALLEL_MIN_PAGES)
+    futures = {}
+    if parallel:
+        try:
+            pool = get_extract_pool()
+            futures = {start: pool.submit(extract_page_range, path, start, stop) for start, stop in ranges}
+        except Exception:
+            traceback.print_exc()
+            _reset_pool()
+            futures = {}
+
+    range_stop = dict(ranges)
+    collected = 0
+    try:
+        page = 0
+        while page < page_count:
+            if page in cached:
+                texts = [cached[page]]
+            else:
+                stop = range_stop[page]
+                try:
+                    texts = futures[page].result() if page in futures else None
+                except BrokenProcessPool:
+                    _reset_pool()
+                    texts = None
+                if texts is None:
+                    texts = extract_page_range(path, page, stop)
+                store_pages(content_hash, page, texts)
+
+            for text in texts:
+                yield page, text
+                page += 1
+                collected += len(text)
+                if max_chars is not None and collected >= max_chars:
+                    return
+    finally:
+        # Early stop (or an error): don't parse ranges nobody will read
+        for future in futures.values():
+            future.cancel()
+
+
+def extract_pdf_pages(path: str, content_hash: str | None = None, max_chars: int | None = None) -> list[str]:
+    return [text for _, text in iter_pdf_pages(path, content_hash, max_chars)]
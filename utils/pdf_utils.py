@@ -1,43 +1,203 @@
+import hashlib
 import os
-from PyPDF2 import PdfReader
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from chatbot_backend import ask_ai  # reuse your Gemini helper
+from db import db_cursor
+from utils.pdf_extract import PDFExtractError, extract_pdf_pages
+
+# Map-reduce summarization: page-aligned chunks are summarized concurrently,
+# then the chunk summaries are merged. Chunk summaries are cached by content
+# hash (pdf_chunk_summaries table), so an edited PDF only re-asks for the
+# chunks that changed, and a retried job only for the chunks that failed.
+SUMMARY_PAGES_PER_CHUNK = int(os.getenv("SUMMARY_PAGES_PER_CHUNK", "4"))
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "8000"))   # max text per AI call
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))              # chunk summaries in parallel
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "400000"))     # text read from huge PDFs
+
+FINAL_PROMPT = (
+    "You are a helpful teaching assistant. Read the following study material "
+    "and create a short summary with:\n"
+    "1. A 3-5 line overview\n"
+    "2. 3-6 key bullet points\n"
+    "3. Difficulty level (Beginner / Intermediate / Advanced)\n\n"
+    "CONTENT:\n{text}"
+)
+
+CHUNK_PROMPT = (
+    "You are a helpful teaching assistant. Summarize this part ({label}) of a "
+    "study document in 4-8 concise bullet points, keeping key terms, "
+    "definitions and formulas.\n\n"
+    "CONTENT:\n{text}"
+)
+
+REDUCE_PROMPT = (
+    "You are a helpful teaching assistant. Below are summaries of consecutive "
+    "parts of one study document. Create a short summary of the whole "
+    "document with:\n"
+    "1. A 3-5 line overview\n"
+    "2. 3-6 key bullet points\n"
+    "3. Difficulty level (Beginner / Intermediate / Advanced)\n\n"
+    "PART SUMMARIES:\n{text}"
+)
+
+
+def extract_pdf_text(path: str, max_chars: int | None = None) -> str:
+    """Extract raw text from a PDF file (raises PDFExtractError if unreadable)."""
+    return "\n".join(extract_pdf_pages(path, max_chars=max_chars))
+
+
+def chunk_pages(pages: list[str]):
+    """
+    [(label, text)] chunks of SUMMARY_PAGES_PER_CHUNK pages, split further
+    if longer than SUMMARY_CHUNK_CHARS. Page-aligned, so editing one page
+    leaves the other chunks' hashes unchanged.
+    """
+    chunks = []
+    for start in range(0, len(pages), SUMMARY_PAGES_PER_CHUNK):
+        group = pages[start:start + SUMMARY_PAGES_PER_CHUNK]
+        text = "\n".join(group).strip()
+        if not text:
+            continue
+        label = f"pages {start + 1}-{start + len(group)}"
+        for offset in range(0, len(text), SUMMARY_CHUNK_CHARS):
+            chunks.append((label, text[offset:offset + SUMMARY_CHUNK_CHARS]))
+    return chunks
+
+
+# Called before every summarization AI call when set (the backfill CLI paces
+# itself with it: one long PDF makes a call per chunk plus the merge)
+_call_throttle = None
+
+
+def set_call_throttle(throttle):
+    """throttle() runs before each AI call made here; None removes it."""
+    global _call_throttle
+    _call_throttle = throttle
+
+
+def _ask(prompt: str) -> str:
+    if _call_throttle is not None:
+        _call_throttle()
+    # Not through the chat response cache: chunk summaries have their own
+    # (below), and these long prompts would only push chat answers out of it
+    answer = ask_ai(prompt, use_cache=False)
+    if answer.startswith("AI Error:"):
+        raise RuntimeError(answer)
+    return answer
+
+
+# ------------------------------------------------------
+# Chunk summary cache (content hash -> summary)
+# ------------------------------------------------------
+def _chunk_hash(text: str) -> str:
+    return hashlib.sha256(CHUNK_PROMPT.encode("utf-8") + b"\0" + text.encode("utf-8")).hexdigest()
+
+
+def _cached_summaries(hashes) -> dict:
+    try:
+        with db_cursor() as cur:
+            cur.execute(
+                "SELECT content_hash, summary FROM pdf_chunk_summaries WHERE content_hash = ANY(%s);",
+                (list(hashes),)
+            )
+            return dict(cur.fetchall())
+    except Exception:
+        traceback.print_exc()   # summarize without the cache
+        return {}
 
 
-def extract_pdf_text(path: str) -> str:
-    """Extract raw text from a PDF file."""
-    if not os.path.exists(path):
-        return ""
+def _store_summaries(items):
     try:
-        reader = PdfReader(path)
-        parts = []
-        for page in reader.pages:
-            text = page.extract_text() or ""
-            parts.append(text)
-        return "\n".join(parts)
+        with db_cursor() as cur:
+            cur.executemany("""
+                INSERT INTO pdf_chunk_summaries (content_hash, summary) VALUES (%s, %s)
+                ON CONFLICT (content_hash) DO NOTHING;
+            """, items)
     except Exception:
-        return ""
+        traceback.print_exc()
 
 
-def summarize_pdf(path: str) -> str | None:
+def summarize_chunks(chunks) -> list[str]:
     """
-    Use AI to summarize the PDF for students.
-    Returns None if extraction fails.
+    Map step: one summary per (label, text) chunk, cached ones reused.
+    Each summary is stored as soon as it arrives, so if some chunks fail
+    (the first error is raised once the rest finish), a retry of the job
+    only asks for the chunks that are still missing.
     """
-    text = extract_pdf_text(path)
-    if not text.strip():
+    hashes = [_chunk_hash(text) for _, text in chunks]
+    cached = _cached_summaries(set(hashes))
+
+    todo = {h: (label, text) for h, (label, text) in zip(hashes, chunks) if h not in cached}
+    error = None
+    if todo:
+        with ThreadPoolExecutor(min(SUMMARY_WORKERS, len(todo))) as pool:
+            futures = {
+                pool.submit(_ask, CHUNK_PROMPT.format(label=label, text=text)): h
+                for h, (label, text) in todo.items()
+            }
+            for future in as_completed(futures):
+                h = futures[future]
+                try:
+                    cached[h] = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                _store_summaries([(h, cached[h])])
+    if error:
+        raise error
+
+    return [cached[h] for h in hashes]
+
+
+def reduce_summaries(labels, summaries) -> str:
+    """Reduce step: merge part summaries (in batches if they don't fit one call)."""
+    parts = [f"[{label}]\n{summary}" for label, summary in zip(labels, summaries)]
+
+    while len("\n\n".join(parts)) > SUMMARY_CHUNK_CHARS and len(parts) > 1:
+        batches, batch = [], []
+        for part in parts:
+            if batch and len("\n\n".join(batch + [part])) > SUMMARY_CHUNK_CHARS:
+                batches.append(batch)
+                batch = []
+            batch.append(part)
+        batches.append(batch)
+        if len(batches) == len(parts):
+            break   # every part is already too big to pair up
+
+        with ThreadPoolExecutor(min(SUMMARY_WORKERS, len(batches))) as pool:
+            parts = list(pool.map(
+                lambda b: _ask(CHUNK_PROMPT.format(label="several parts", text="\n\n".join(b))),
+                batches
+            ))
+
+    return _ask(REDUCE_PROMPT.format(text="\n\n".join(parts)[:SUMMARY_CHUNK_CHARS]))
+
+
+def summarize_pages(pages: list[str]) -> str | None:
+    """Summary of a document given its page texts (None if there is no text)."""
+    chunks = chunk_pages(pages)
+    if not chunks:
         return None
 
-    # Avoid sending huge texts; truncate for safety
-    short_text = text[:8000]
+    # Short documents: a single call, as before
+    if len(chunks) == 1:
+        return _ask(FINAL_PROMPT.format(text=chunks[0][1]))
 
-    prompt = (
-        "You are a helpful teaching assistant. Read the following study material "
-        "and create a short summary with:\n"
-        "1. A 3-5 line overview\n"
-        "2. 3-6 key bullet points\n"
-        "3. Difficulty level (Beginner / Intermediate / Advanced)\n\n"
-        f"CONTENT:\n{short_text}"
-    )
+    summaries = summarize_chunks(chunks)
+    return reduce_summaries([label for label, _ in chunks], summaries)
 
-    answer = ask_ai(prompt)
-    return answer
+
+def summarize_pdf(path: str, content_hash: str | None = None) -> str | None:
+    """
+    Use AI to summarize the PDF for students.
+    Returns None if the PDF has no readable text; raises if the AI calls fail.
+    """
+    try:
+        pages = extract_pdf_pages(path, content_hash, max_chars=SUMMARY_MAX_CHARS)
+    except PDFExtractError as e:
+        print(f"SUMMARY skipped => {e}")
+        return None
+
+    return summarize_pages(pages)
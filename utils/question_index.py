@@ -0,0 +1,205 @@
+# utils/question_index.py
+# Near-duplicate lookup over past chatbot questions (ai_logs), so paraphrases
+# like "what is a linked list" / "explain linked lists" reuse a stored answer.
+# Questions become hashed word + character n-gram vectors (L2-normalized
+# float32 rows in a NumPy matrix); lookup is a top-k cosine search.
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from db import db_cursor
+
+QUESTION_INDEX_DIM = int(os.getenv("QUESTION_INDEX_DIM", "1024"))
+QUESTION_INDEX_SIZE = int(os.getenv("QUESTION_INDEX_SIZE", "10000"))   # most recent questions kept
+QUESTION_INDEX_SYNC = float(os.getenv("QUESTION_INDEX_SYNC", "10"))    # seconds between catch-up reads
+QUESTION_INDEX_RESCAN = int(os.getenv("QUESTION_INDEX_RESCAN", "1000"))  # ids re-read below the newest seen
+CHAT_SIMILARITY_THRESHOLD = float(os.getenv("CHAT_SIMILARITY_THRESHOLD", "0.95"))
+
+# Words that phrase a question without changing what is asked. Interrogatives
+# (how / why / when ...), comparison words and direction words ("to", "from")
+# are kept: "why use X" and "how use X" are different questions.
+STOPWORDS = frozenset("""
+a an the is are was were be of in on for and or with about what whats does do did
+can could would should please explain describe define tell me give i you my your
+it its this that these those meaning mean
+""".split())
+
+# "difference between X and Y", "X versus Y", "compare X and Y" -> "vs"
+COMPARE_WORDS = frozenset("vs versus difference differences compare comparison between".split())
+
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def _tokens(text: str):
+    words = []
+    pending_vs = False   # "difference between X and Y": the "and" becomes "vs"
+    for w in _WORD_RE.findall(text.lower()):
+        if w == "and" and pending_vs:
+            w, pending_vs = "vs", False
+        elif w in STOPWORDS:
+            continue
+        elif w in COMPARE_WORDS:
+            if not words:
+                pending_vs = True
+                continue
+            if words[-1] == "vs":
+                continue
+            w = "vs"
+        elif len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]   # plural -> singular, roughly
+        words.append(w)
+    return words
+
+
+def _features(text: str):
+    """
+    (feature, weight) pairs: words, word pairs and char trigrams (typo
+    tolerance). Word pairs weigh as much as words, so word order counts:
+    "celsius to fahrenheit" and "fahrenheit to celsius" stay apart.
+    """
+    words = _tokens(text)
+    for w in words:
+        yield "w:" + w, 1.0
+        padded = f"#{w}#"
+        for i in range(len(padded) - 2):
+            yield "c:" + padded[i:i + 3], 0.25
+    for a, b in zip(words, words[1:]):
+        yield f"b:{a} {b}", 1.0
+
+
+def embed(text: str, dim: int = QUESTION_INDEX_DIM) -> np.ndarray:
+    """Signed feature hashing into `dim` buckets, L2-normalized."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature, weight in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % dim] += weight if (h >> 31) & 1 else -weight
+    norm = np.linalg.norm(vec)
+    if norm:
+        vec /= norm
+    return vec
+
+
+class QuestionIndex:
+    """
+    Ring buffer of question vectors (capacity rows) + their ai_logs ids.
+    Answers stay in the database; only ids and vectors are held in memory.
+    """
+
+    def __init__(self, dim: int = QUESTION_INDEX_DIM, capacity: int = QUESTION_INDEX_SIZE):
+        self.dim = dim
+        self.capacity = capacity
+        self._vecs = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._present = set()
+        self._n = 0
+        self._pos = 0
+        self._synced_id = 0          # highest ai_logs id read from the table
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._n
+
+    def add(self, log_id: int, question: str):
+        vec = embed(question, self.dim)
+        if not vec.any():
+            return
+        with self._lock:
+            if log_id in self._present:
+                return
+            if self._n == self.capacity:
+                self._present.discard(int(self._ids[self._pos]))
+            else:
+                self._n += 1
+            self._vecs[self._pos] = vec
+            self._ids[self._pos] = log_id
+            self._present.add(log_id)
+            self._pos = (self._pos + 1) % self.capacity
+
+    def search(self, question: str, k: int = 5):
+        """Top-k [(log_id, cosine)] for a question, best first."""
+        q = embed(question, self.dim)
+        if not q.any():
+            return []
+        with self._lock:
+            n = self._n
+            if n == 0:
+                return []
+            sims = self._vecs[:n] @ q
+            ids = self._ids[:n].copy()
+        k = min(k, n)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(int(ids[i]), float(sims[i])) for i in top]
+
+    def sync(self, force: bool = False):
+        """
+        Add ai_logs rows written since the last sync (incl. other processes').
+        ids are handed out at INSERT but become visible at COMMIT, so a row
+        can appear below the highest id already read: each sync re-reads the
+        last QUESTION_INDEX_RESCAN ids and skips the ones already indexed.
+        """
+        now = time.monotonic()
+        if not force and now - self._synced_at < QUESTION_INDEX_SYNC:
+            return
+        self._synced_at = now
+
+        with db_cursor() as cur:
+            if self._synced_id:
+                cur.execute("""
+                    SELECT id, question FROM ai_logs
+                    WHERE id > %s AND answer NOT LIKE 'AI Error:%%'
+                    ORDER BY id;
+                """, (self._synced_id - min(QUESTION_INDEX_RESCAN, self.capacity),))
+            else:
+                cur.execute("""
+                    SELECT id, question FROM (
+                        SELECT id, question FROM ai_logs
+                        WHERE answer NOT LIKE 'AI Error:%%'
+                        ORDER BY id DESC
+                        LIMIT %s
+                    ) recent ORDER BY id;
+                """, (self.capacity,))
+            rows = cur.fetchall()
+
+        for log_id, question in rows:
+            if log_id not in self._present:
+                self.add(log_id, question)
+        if rows:
+            self._synced_id = max(self._synced_id, rows[-1][0])
+
+    def lookup(self, question: str, threshold: float = CHAT_SIMILARITY_THRESHOLD):
+        """Stored answer for the closest past question, if similar enough."""
+        self.sync()
+        for log_id, sim in self.search(question, k=3):
+            if sim < threshold:
+                break
+            with db_cursor() as cur:
+                cur.execute("SELECT answer FROM ai_logs WHERE id = %s;", (log_id,))
+                row = cur.fetchone()
+            if row:
+                return row[0]
+        return None
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_question_index() -> QuestionIndex:
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = QuestionIndex()
+    return _index
+
+
+def index_question(log_id: int, question: str):
+    """ai_logs hook: add the new row if this process has an index."""
+    if _index is not None:
+        _index.add(log_id, question)
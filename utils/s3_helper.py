@@ -1,18 +1,57 @@
 import boto3
 import os
+import threading
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from dotenv import load_dotenv
 
 load_dotenv()
 
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_DEFAULT_REGION")
-)
-
 BUCKET = os.getenv("S3_BUCKET")
 CLOUDFRONT = os.getenv("CLOUDFRONT_DOMAIN")
 
+MB = 1024 * 1024
+
+# One client per process: boto3 clients are thread-safe and keep a pooled,
+# keep-alive HTTP connection pool, so reuse beats building one per call.
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", "20")),
+    tcp_keepalive=True,
+    retries={
+        "mode": os.getenv("S3_RETRY_MODE", "standard"),
+        "max_attempts": int(os.getenv("S3_MAX_ATTEMPTS", "5")),
+    },
+)
+
+# Multipart settings shared by the web app and the desktop dashboards
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")) * MB,
+    multipart_chunksize=int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "8")) * MB,
+    max_concurrency=int(os.getenv("S3_MAX_CONCURRENCY", "4")),
+)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Shared S3 client, created on first use (and again after a fork)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                # Sessions are not thread-safe; build the client from a private one under the lock
+                session = boto3.session.Session(
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    region_name=os.getenv("AWS_DEFAULT_REGION")
+                )
+                _client = session.client("s3", config=CLIENT_CONFIG)
+                _client_pid = pid
+    return _client
+
+
 def cloudfront_url(key):
     return f"https://{CLOUDFRONT}/{key}"
@@ -1,37 +1,31 @@
-import boto3
+import hashlib
 import mimetypes
 import os
+import tempfile
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from utils.s3_helper import cloudfront_url
+from utils.s3_helper import cloudfront_url, get_s3_client, TRANSFER_CONFIG
 
 load_dotenv()
 
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-REGION = os.getenv("AWS_DEFAULT_REGION")
 S3_BUCKET = os.getenv("S3_BUCKET")
+HASH_CHUNK = 1024 * 1024
+
 
 def s3_client():
-    return boto3.client(
-        "s3",
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        region_name=REGION
-    )
+    return get_s3_client()
 
-def upload_file_with_metadata(file_path, key=None, extra_args=None, callback=None):
+
+def upload_stream(fileobj, key, content_type=None, extra_args=None, callback=None):
     """
-    Uploads file to S3 and ALWAYS returns CloudFront URL.
-    Ensures correct ContentType + inline preview for PDF.
+    Uploads a readable (possibly non-seekable) stream to S3 as a multipart
+    upload (TRANSFER_CONFIG) and returns the CloudFront URL.
     """
     client = s3_client()
-    
-    if key is None:
-        key = os.path.basename(file_path)
 
-    # Guess MIME type
-    content_type, _ = mimetypes.guess_type(file_path)
+    # Guess MIME type from the key when the caller doesn't know it
+    if content_type is None or content_type == "application/octet-stream":
+        content_type, _ = mimetypes.guess_type(key)
     if content_type is None:
         content_type = "application/octet-stream"
 
@@ -40,18 +34,35 @@ def upload_file_with_metadata(file_path, key=None, extra_args=None, callback=Non
     extra.setdefault("ContentDisposition", "inline")
 
     try:
-        with open(file_path, "rb") as f:
-            client.upload_fileobj(f, S3_BUCKET, key, ExtraArgs=extra, Callback=callback)
-
-        # DEBUG PRINTS TO VERIFY
-        print("DEBUG CLOUDFRONT =>", os.getenv("CLOUDFRONT_DOMAIN"))
-        print("DEBUG RETURNING URL =>", cloudfront_url(key))
-
+        client.upload_fileobj(
+            fileobj, S3_BUCKET, key,
+            ExtraArgs=extra, Callback=callback, Config=TRANSFER_CONFIG
+        )
         # Always return CloudFront URL
         return cloudfront_url(key)
 
     except ClientError as e:
         raise Exception(f"S3 Upload Failed: {e}")
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def object_sha256(key: str) -> str:
+    """SHA-256 of an S3 object, streamed (nothing written to disk)."""
+    client = s3_client()
+    body = client.get_object(Bucket=S3_BUCKET, Key=key)["Body"]
+    sha = hashlib.sha256()
+    for chunk in body.iter_chunks(HASH_CHUNK):
+        sha.update(chunk)
+    return sha.hexdigest()
+
+
 def delete_file(key: str):
     """Delete a file from S3 by key (filename)."""
     client = s3_client()
@@ -69,3 +80,103 @@ def rename_file(old_key: str, new_key: str):
         Key=new_key
     )
     client.delete_object(Bucket=S3_BUCKET, Key=old_key)
+
+
+def download_file(key: str, dest_path: str):
+    """Download an S3 object (by key) to a local path."""
+    client = s3_client()
+    client.download_file(S3_BUCKET, key, dest_path)
+
+
+def download_to_temp(key: str, suffix: str = "") -> str:
+    """Download an S3 object to a new temp file; the caller removes it."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        download_file(key, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+# ======================================================
+# DIRECT (BROWSER -> S3) UPLOADS
+# ======================================================
+PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+MAX_PARTS = 10000
+
+
+def presigned_post(key: str, content_type: str, max_size: int):
+    """Presigned POST (url + form fields) for a single-request browser upload."""
+    client = s3_client()
+    fields = {"Content-Type": content_type, "Content-Disposition": "inline"}
+    conditions = [
+        {"Content-Type": content_type},
+        {"Content-Disposition": "inline"},
+        ["content-length-range", 1, max_size],
+    ]
+    return client.generate_presigned_post(
+        S3_BUCKET, key, Fields=fields, Conditions=conditions, ExpiresIn=PRESIGN_EXPIRES
+    )
+
+
+def multipart_part_size(size: int) -> int:
+    """TRANSFER_CONFIG part size, grown if needed to stay under S3's part limit."""
+    part = TRANSFER_CONFIG.multipart_chunksize
+    while size > part * MAX_PARTS:
+        part *= 2
+    return part
+
+
+def start_multipart(key: str, content_type: str) -> str:
+    client = s3_client()
+    resp = client.create_multipart_upload(
+        Bucket=S3_BUCKET, Key=key, ContentType=content_type, ContentDisposition="inline"
+    )
+    return resp["UploadId"]
+
+
+def presign_part(key: str, upload_id: str, part_number: int) -> str:
+    client = s3_client()
+    return client.generate_presigned_url(
+        "upload_part",
+        Params={"Bucket": S3_BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+        ExpiresIn=PRESIGN_EXPIRES
+    )
+
+
+def list_uploaded_parts(key: str, upload_id: str):
+    """Parts S3 already has (for resuming): [{"PartNumber", "ETag", "Size"}]."""
+    client = s3_client()
+    parts = []
+    paginator = client.get_paginator("list_parts")
+    for page in paginator.paginate(Bucket=S3_BUCKET, Key=key, UploadId=upload_id):
+        for p in page.get("Parts", []):
+            parts.append({"PartNumber": p["PartNumber"], "ETag": p["ETag"], "Size": p["Size"]})
+    return parts
+
+
+def complete_multipart(key: str, upload_id: str, parts):
+    client = s3_client()
+    parts = sorted(
+        ({"PartNumber": int(p["PartNumber"]), "ETag": p["ETag"]} for p in parts),
+        key=lambda p: p["PartNumber"]
+    )
+    client.complete_multipart_upload(
+        Bucket=S3_BUCKET, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+    )
+
+
+def abort_multipart(key: str, upload_id: str):
+    client = s3_client()
+    client.abort_multipart_upload(Bucket=S3_BUCKET, Key=key, UploadId=upload_id)
+
+
+def object_size(key: str):
+    """Size in bytes of an S3 object, or None if it doesn't exist."""
+    client = s3_client()
+    try:
+        return client.head_object(Bucket=S3_BUCKET, Key=key)["ContentLength"]
+    except ClientError:
+        return None
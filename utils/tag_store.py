@@ -0,0 +1,169 @@
+# utils/tag_store.py
+# Normalized tag storage: tags(id, name) + upload_tags(upload_id, tag_id).
+# uploads.tags keeps a comma-joined copy only to feed uploads.search_text.
+# upload_tags.weight (0..1, from utils/ai_tags.py) orders an upload's tags.
+
+from psycopg2.extras import execute_values
+
+# Select-list expression returning an upload's tags as a Python list
+TAGS_ARRAY_SQL = """ARRAY(
+    SELECT t.name FROM upload_tags ut JOIN tags t ON t.id = ut.tag_id
+    WHERE ut.upload_id = uploads.id ORDER BY ut.weight DESC, t.name
+) AS tags"""
+
+
+def create_tag_tables(cur):
+    """Create tags / upload_tags and their lookup indexes."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+    """)
+    # Serves both exact (=) and prefix (LIKE 'x%') lookups on the lowercased name
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS tags_name_lower_idx
+        ON tags (lower(name) text_pattern_ops);
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS upload_tags (
+            upload_id INTEGER NOT NULL REFERENCES uploads(id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+            PRIMARY KEY (upload_id, tag_id)
+        );
+    """)
+    cur.execute("ALTER TABLE upload_tags ADD COLUMN IF NOT EXISTS weight REAL NOT NULL DEFAULT 1;")
+    # Inverted index: tag -> uploads
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS upload_tags_tag_idx
+        ON upload_tags (tag_id, upload_id);
+    """)
+
+
+def migrate_legacy_tags(cur):
+    """Copy comma-joined uploads.tags into upload_tags for rows not yet migrated."""
+    cur.execute("""
+        INSERT INTO tags (name)
+        SELECT DISTINCT ON (lower(btrim(t))) btrim(t)
+        FROM uploads u, unnest(string_to_array(u.tags, ',')) AS t
+        WHERE btrim(t) <> ''
+          AND NOT EXISTS (SELECT 1 FROM upload_tags ut WHERE ut.upload_id = u.id)
+        ON CONFLICT DO NOTHING;
+    """)
+    cur.execute("""
+        INSERT INTO upload_tags (upload_id, tag_id)
+        SELECT u.id, tg.id
+        FROM uploads u
+        CROSS JOIN LATERAL unnest(string_to_array(u.tags, ',')) AS t
+        JOIN tags tg ON lower(tg.name) = lower(btrim(t))
+        WHERE NOT EXISTS (SELECT 1 FROM upload_tags ut WHERE ut.upload_id = u.id)
+        ON CONFLICT DO NOTHING;
+    """)
+
+
+def set_upload_tags(cur, upload_id: int, tags):
+    """
+    Replace an upload's tags (creating any new tag names). `tags` is a list
+    of names or a {name: weight} dict.
+    """
+    weights = tags if isinstance(tags, dict) else dict.fromkeys(tags or [], 1.0)
+    names = {}
+    for t, w in weights.items():
+        if t and t.strip():
+            names.setdefault(t.strip(), w)
+    cur.execute("DELETE FROM upload_tags WHERE upload_id = %s;", (upload_id,))
+    if not names:
+        return
+
+    cur.execute("""
+        INSERT INTO tags (name) SELECT unnest(%s::text[])
+        ON CONFLICT DO NOTHING;
+    """, (list(names),))
+    cur.execute("""
+        INSERT INTO upload_tags (upload_id, tag_id, weight)
+        SELECT %s, t.id, w.weight
+        FROM unnest(%s::text[], %s::real[]) AS w(name, weight)
+        JOIN tags t ON lower(t.name) = w.name
+        ON CONFLICT DO NOTHING;
+    """, (upload_id, [n.lower() for n in names], list(names.values())))
+
+
+def copy_upload_tags(cur, from_id: int, to_id: int):
+    """Give `to_id` the same weighted tags as `from_id` (deduplicated uploads)."""
+    cur.execute("DELETE FROM upload_tags WHERE upload_id = %s;", (to_id,))
+    cur.execute("""
+        INSERT INTO upload_tags (upload_id, tag_id, weight)
+        SELECT %s, tag_id, weight FROM upload_tags WHERE upload_id = %s;
+    """, (to_id, from_id))
+
+
+def set_upload_tags_bulk(cur, rows):
+    """
+    set_upload_tags() for many uploads in a few statements (batch jobs).
+    rows: [(upload_id, {name: weight})].
+    """
+    if not rows:
+        return
+    pairs = {}
+    for upload_id, weights in rows:
+        for t, w in weights.items():
+            if t and t.strip():
+                pairs.setdefault((upload_id, t.strip().lower()), (t.strip(), w))
+
+    cur.execute("DELETE FROM upload_tags WHERE upload_id = ANY(%s);", ([r[0] for r in rows],))
+    if not pairs:
+        return
+    cur.execute("""
+        INSERT INTO tags (name) SELECT unnest(%s::text[])
+        ON CONFLICT DO NOTHING;
+    """, (list({name for name, _ in pairs.values()}),))
+    execute_values(cur, """
+        INSERT INTO upload_tags (upload_id, tag_id, weight)
+        SELECT v.upload_id, t.id, v.weight
+        FROM (VALUES %s) AS v(upload_id, name, weight)
+        JOIN tags t ON lower(t.name) = v.name
+        ON CONFLICT DO NOTHING;
+    """, [(uid, key, w) for (uid, key), (_, w) in pairs.items()],
+        template="(%s::int, %s::text, %s::real)", page_size=1000)
+
+
+def parse_tag_query(values):
+    """
+    Split ?tag= values ("a,b", "pyth*") into (exact, prefixes), lowercased.
+    A trailing * marks a prefix match.
+    """
+    exact, prefixes = [], []
+    for v in values:
+        for t in v.split(","):
+            t = t.strip().lower()
+            if not t:
+                continue
+            if t.endswith("*"):
+                if t.rstrip("*"):
+                    prefixes.append(t.rstrip("*"))
+            else:
+                exact.append(t)
+    return exact, prefixes
+
+
+def tag_filter_sql(exact, prefixes, mode: str = "all"):
+    """
+    WHERE fragment (and params) restricting uploads by tag.
+    mode="all" requires every term to match (AND), "any" at least one (OR).
+    Returns (None, []) when there is nothing to filter on.
+    """
+    terms, params = [], []
+    for t in exact:
+        terms.append("lower(t.name) = %s")
+        params.append(t)
+    for p in prefixes:
+        terms.append("lower(t.name) LIKE %s")
+        params.append(p.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+    if not terms:
+        return None, []
+
+    sub = "uploads.id IN (SELECT ut.upload_id FROM upload_tags ut JOIN tags t ON t.id = ut.tag_id WHERE {})"
+    if mode == "any":
+        return sub.format(" OR ".join(terms)), params
+    return "(" + " AND ".join(sub.format(term) for term in terms) + ")", params
@@ -0,0 +1,123 @@
+# utils/upload_pipeline.py
+# Background half of an upload: tags (from the filename + PDF text) and the
+# PDF summary, then status -> ready.
+# Uploads whose content (SHA-256) was already processed reuse that S3 object
+# and its tags/summary instead of calling the AI again.
+import os
+
+from db import db_cursor
+from utils.ai_tags import tag_weights
+from utils.content_search import index_pdf
+from utils.pdf_extract import cached_text
+from utils.pdf_utils import summarize_pdf
+from utils.storage_utils import download_to_temp, delete_file, file_sha256, object_sha256
+from utils.tag_store import TAGS_ARRAY_SQL, copy_upload_tags, set_upload_tags
+
+PROCESS_UPLOAD = "process_upload"
+TAG_TEXT_CHARS = int(os.getenv("TAG_TEXT_CHARS", "200000"))   # PDF text fed to the tagger
+
+
+def set_upload_status(upload_id: int, status: str):
+    with db_cursor() as cur:
+        cur.execute("UPDATE uploads SET status = %s WHERE id = %s;", (status, upload_id))
+
+
+def find_duplicate(content_hash: str, exclude_id: int | None = None, uploaded_by: str | None = None):
+    """
+    An already processed upload with the same content, or None.
+    Only rows with a generated S3 key qualify: legacy filename keys can be
+    overwritten by a later upload of the same name. `uploaded_by` limits
+    the match to one user's uploads (for hashes the server didn't compute).
+    """
+    if not content_hash:
+        return None
+    with db_cursor(dict_rows=True) as cur:
+        cur.execute(f"""
+            SELECT id, url, s3_key, size_bytes, summary, {TAGS_ARRAY_SQL}
+            FROM uploads
+            WHERE content_hash = %s AND status = 'ready' AND s3_key IS NOT NULL
+              AND id <> %s AND (%s::text IS NULL OR uploaded_by = %s)
+            ORDER BY id
+            LIMIT 1;
+        """, (content_hash, exclude_id or 0, uploaded_by, uploaded_by))
+        return cur.fetchone()
+
+
+def _reuse_duplicate(upload_id: int, own_key: str, content_hash: str, dup: dict):
+    """Point the upload at the existing object and copy its tags/summary."""
+    with db_cursor() as cur:
+        cur.execute("""
+            UPDATE uploads
+            SET url = %s, s3_key = %s, tags = %s, summary = %s,
+                content_hash = %s, status = 'ready'
+            WHERE id = %s;
+        """, (dup["url"], dup["s3_key"], ",".join(dup["tags"]), dup["summary"],
+              content_hash, upload_id))
+        copy_upload_tags(cur, dup["id"], upload_id)
+
+    if own_key != dup["s3_key"]:
+        delete_file(own_key)
+
+
+def process_upload(payload: dict):
+    """
+    Job handler for PROCESS_UPLOAD: {"upload_id": int}.
+    The payload names no local files: PDFs are downloaded from S3 here, so
+    workers may run on any host.
+    """
+    upload_id = payload["upload_id"]
+
+    with db_cursor() as cur:
+        cur.execute("""
+            UPDATE uploads SET status = 'processing'
+            WHERE id = %s
+            RETURNING filename, COALESCE(s3_key, filename), s3_key IS NOT NULL, content_hash;
+        """, (upload_id,))
+        row = cur.fetchone()
+
+    if row is None:
+        # Deleted before we got to it
+        return
+
+    filename, key, generated_key, content_hash = row
+    is_pdf = filename.lower().endswith(".pdf")
+
+    # PDFs are needed locally for text extraction
+    local_path = download_to_temp(key, ".pdf") if is_pdf else None
+
+    try:
+        # Direct (browser -> S3) uploads are hashed here, from the stored object
+        if content_hash is None:
+            content_hash = file_sha256(local_path) if local_path else object_sha256(key)
+
+        dup = find_duplicate(content_hash, exclude_id=upload_id) if generated_key else None
+        if dup:
+            _reuse_duplicate(upload_id, key, content_hash, dup)
+        else:
+            text = None
+            if is_pdf:
+                # Every page goes into the search index; tags and summary then read them from there
+                index_pdf(local_path, content_hash)
+                text = cached_text(content_hash, TAG_TEXT_CHARS)
+            tags = tag_weights(filename, text)
+            summary = summarize_pdf(local_path, content_hash) if is_pdf else None
+
+            with db_cursor() as cur:
+                cur.execute("""
+                    UPDATE uploads
+                    SET tags = %s, summary = %s, content_hash = %s, status = 'ready'
+                    WHERE id = %s;
+                """, (",".join(tags), summary, content_hash, upload_id))
+                set_upload_tags(cur, upload_id, tags)
+    finally:
+        if local_path:
+            os.remove(local_path)
+
+
+def upload_failed(payload: dict, error: str):
+    """on_failure hook: mark the upload failed."""
+    set_upload_status(payload["upload_id"], "failed")
+
+
+HANDLERS = {PROCESS_UPLOAD: process_upload}
+ON_FAILURE = {PROCESS_UPLOAD: upload_failed}
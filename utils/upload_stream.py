@@ -0,0 +1,109 @@
+# utils/upload_stream.py
+# Read the file part of a multipart/form-data request body as a plain,
+# forward-only stream, so it can go straight to S3 without a temp file.
+import hashlib
+import io
+
+from werkzeug.sansio.multipart import MultipartDecoder, NEED_DATA, Data, File, Epilogue
+
+READ_CHUNK = 64 * 1024
+
+
+class MultipartFileStream(io.RawIOBase):
+    """
+    Pull-style reader over one file field of a multipart body.
+    Call open() first; it skips to the field and sets `filename` / `content_type`.
+    """
+
+    def __init__(self, stream, boundary: bytes, field: str = "file", chunk_size: int = READ_CHUNK):
+        self._stream = stream
+        self._decoder = MultipartDecoder(boundary)
+        self._field = field
+        self._chunk_size = chunk_size
+        self._buf = b""
+        self._done = False
+        self._exhausted = False
+        self.filename = None
+        self.content_type = None
+
+    def _next_event(self):
+        while True:
+            event = self._decoder.next_event()
+            if event is not NEED_DATA:
+                return event
+            if self._exhausted:
+                raise ValueError("Multipart body ended unexpectedly.")
+            chunk = self._stream.read(self._chunk_size)
+            if not chunk:
+                self._exhausted = True
+                self._decoder.receive_data(None)
+            else:
+                self._decoder.receive_data(chunk)
+
+    def open(self):
+        """Advance to the file field. Raises ValueError if the body has none."""
+        while True:
+            event = self._next_event()
+            if isinstance(event, File) and event.name == self._field:
+                self.filename = event.filename
+                self.content_type = event.headers.get("Content-Type")
+                return self
+            if isinstance(event, Epilogue):
+                raise ValueError(f"No '{self._field}' file in request.")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf and not self._done:
+            event = self._next_event()
+            if not isinstance(event, Data):
+                continue
+            self._buf = event.data
+            if not event.more_data:
+                self._done = True
+
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Wraps a readable stream: SHA-256 and byte count are computed as the
+    data passes through.
+    """
+
+    def __init__(self, fileobj):
+        self._f = fileobj
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._f.readinto(b)
+        if n:
+            chunk = memoryview(b)[:n]
+            self._sha.update(chunk)
+            self.size += n
+        return n
+
+    def read(self, size=-1) -> bytes:
+        # s3transfer treats a short read as end-of-stream, so fill `size` fully
+        if size is None or size < 0:
+            return self.readall()
+        buf = bytearray(size)
+        view = memoryview(buf)
+        got = 0
+        while got < size:
+            n = self.readinto(view[got:])
+            if not n:
+                break
+            got += n
+        return bytes(view[:got])
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
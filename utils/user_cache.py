@@ -0,0 +1,82 @@
+# utils/user_cache.py
+# Per-process cache of each signed-in user's role and `users.version`, so
+# login_required can check roles without a query per request. An entry is
+# re-read from the DB once it is USER_CACHE_TTL seconds old; changing a role
+# or revoking an account bumps its version (revoking also disables it), so
+# other processes (and their sessions) notice within the TTL and this
+# process at once (invalidate()).
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from db import db_cursor
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "5"))        # seconds before re-checking a user
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))    # users per process
+
+
+class UserCache:
+    def __init__(self, ttl: float = USER_CACHE_TTL, maxsize: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()   # username -> (checked_at, {"role", "version"} | None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def _load(self, username: str):
+        with db_cursor() as cur:
+            cur.execute("SELECT role, version FROM users WHERE username = %s AND NOT disabled;", (username,))
+            row = cur.fetchone()
+        return {"role": row[0], "version": row[1]} if row else None
+
+    def get(self, username: str, fallback=None):
+        """
+        {"role", "version"} for the user, or None if the account no longer
+        exists or was revoked. If the DB can't be reached, the last known
+        entry is used, or `fallback` if there is none.
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(username)
+            if item is not None and now - item[0] < self.ttl:
+                self._data.move_to_end(username)
+                self.hits += 1
+                return item[1]
+
+        try:
+            user = self._load(username)
+        except Exception:
+            traceback.print_exc()
+            return item[1] if item is not None else fallback
+
+        with self._lock:
+            self.loads += 1
+            self._data[username] = (now, user)
+            self._data.move_to_end(username)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return user
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._data.pop(username, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "loads": self.loads, "ttl": self.ttl}
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_user_cache() -> UserCache:
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = UserCache()
+    return _cache